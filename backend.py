@@ -1,13 +1,16 @@
 """
 Backend file contains functions for the game logic.
 """
-from collections import OrderedDict
-from random import shuffle
+from bisect import bisect_left, bisect_right
+from hashlib import blake2b
+from itertools import chain
+from operator import attrgetter
+from random import Random
 import yaml
 
-from util_backend import Direction, Rotation, get_next_coordinates
-from tile import HoleTile
+from util_backend import Direction, Rotation, DIRECTIONS_BY_DELTA, get_next_coordinates
 from loading import get_board, get_map_data, board_from_data
+from grid import get_grid
 
 
 MAX_CARD_COUNT = 9
@@ -22,13 +25,106 @@ class CardNotKnownError(LookupError):
     """Raised when a card doesn't belong to any known type."""
 
 
+class CheckpointError(Exception):
+    """Raised when the state can't be rolled back to the given checkpoint."""
+
+
+class StateHashError(Exception):
+    """Raised when the state hash doesn't match robots' attributes."""
+    def __init__(self, expected, state_hash):
+        self.expected = expected
+        self.state_hash = state_hash
+
+    def __str__(self):
+        return f"Hash of robots: {self.expected:016x}, state hash: {self.state_hash:016x}."
+
+
+class OccupancyIndexError(Exception):
+    """Raised in debug mode when the index of robots' coordinates is out of date."""
+    def __init__(self, expected, indexed):
+        self.expected = expected
+        self.indexed = indexed
+
+    def __str__(self):
+        return f"Robots on the board: {self.expected}, robots in the index: {self.indexed}."
+
+
 # Load of robots displayed names in file robots.yaml
 with open('robots.yaml', encoding='utf-8') as robot_file:
     robot_displayed_names = yaml.safe_load(robot_file)
 
 
+# Robot's attributes sent to clients in the game log, in the order
+# of values in Robot.snapshot().
+LOGGED_ATTRIBUTES = (
+    "name", "coordinates", "lives", "flags", "damages", "permanent_damages",
+    "power_down", "direction", "start_coordinates", "selection_confirmed",
+    "winner", "displayed_name",
+)
+# Robot's attributes which make the state hash (see State.state_hash).
+HASHED_ATTRIBUTES = ("coordinates", "direction", "damages", "flags", "lives")
+HASHED_ATTRIBUTE_SET = frozenset(HASHED_ATTRIBUTES)
+
+
+def logged_attribute(name):
+    """
+    Return property of robot's attribute sent in the game log.
+
+    The value is stored in the slot with underscore, reading it is
+    as fast as reading the slot. When the value changes, the robot's snapshot
+    is thrown away and the state the robot plays in is informed,
+    so it can update the index of robots' coordinates, its version
+    and the state hash (see State.robot_changed).
+    Other attributes (cards) are plain slots, setting them costs nothing more.
+    """
+    slot = "_" + name
+
+    def set_value(robot, value):
+        state = robot._state
+        if state is None:
+            setattr(robot, slot, value)
+            robot._snapshot = None
+            return
+        old_value = getattr(robot, slot)
+        if old_value == value:
+            return
+        setattr(robot, slot, value)
+        robot._snapshot = None
+        state.robot_changed(robot, name, old_value, value)
+
+    return property(attrgetter(slot), set_value)
+
+
 class Robot:
+    # Robots have only the attributes listed here, it makes them smaller
+    # and their attributes faster to get.
+    # Values of LOGGED_ATTRIBUTES are in the slots with underscore.
+    __slots__ = (
+        "_state", "_snapshot", "_direction", "_coordinates", "_start_coordinates",
+        "program", "_lives", "_flags", "_damages", "_permanent_damages",
+        "_power_down", "_name", "_displayed_name", "_selection_confirmed",
+        "card_indexes", "dealt_cards", "_winner",
+    )
+
+    name = logged_attribute("name")
+    coordinates = logged_attribute("coordinates")
+    lives = logged_attribute("lives")
+    flags = logged_attribute("flags")
+    damages = logged_attribute("damages")
+    permanent_damages = logged_attribute("permanent_damages")
+    power_down = logged_attribute("power_down")
+    direction = logged_attribute("direction")
+    start_coordinates = logged_attribute("start_coordinates")
+    selection_confirmed = logged_attribute("selection_confirmed")
+    winner = logged_attribute("winner")
+    displayed_name = logged_attribute("displayed_name")
+
     def __init__(self, direction, coordinates, name):
+        # State the robot plays in, it is set by the State.
+        self._state = None
+        # Robot's snapshot for the game log, None when the robot has changed
+        # since the last snapshot was taken.
+        self._snapshot = None
         self.direction = direction
         self.coordinates = coordinates
         self.start_coordinates = [coordinates]
@@ -42,11 +138,10 @@ class Robot:
         self.displayed_name = robot_displayed_names[self.name]["displayed_name"]
         self.selection_confirmed = False
         self.card_indexes = []
+        self.dealt_cards = []
         self.winner = False
 
     @property
-    # More info about @property decorator - official documentation:
-    # https://docs.python.org/3/library/functions.html#property
     def inactive(self):
         """
         Return True if robot is inactive (not on the game board).
@@ -77,18 +172,24 @@ class Robot:
         """
         Return robot´s info as dictionary for sending with server.
         """
-        return {"robot_data":
-                {"name": self.name, "coordinates": self.coordinates,
-                 "lives": self.lives, "flags": self.flags,
-                 "damages": self.damages,
-                 "permanent_damages": self.permanent_damages,
-                 "power_down": self.power_down,
-                 "direction": self.direction.value,
-                 "start_coordinates": self.start_coordinates,
-                 "selection_confirmed": self.selection_confirmed,
-                 "unblocked_cards": self.unblocked_cards,
-                 "winner": self.winner,
-                 "displayed_name": self.displayed_name}}
+        return snapshot_as_dict(self.snapshot())
+
+    def snapshot(self):
+        """
+        Return robot's info for the game log as a tuple
+        of values of LOGGED_ATTRIBUTES.
+
+        The tuple is kept until the robot changes,
+        so unchanged robots don't create new tuples.
+        """
+        if self._snapshot is None:
+            # The values are read from the slots, without the properties.
+            self._snapshot = (
+                self._name, self._coordinates, self._lives, self._flags,
+                self._damages, self._permanent_damages, self._power_down,
+                self._direction, tuple(self._start_coordinates),
+                self._selection_confirmed, self._winner, self._displayed_name)
+        return self._snapshot
 
     @classmethod
     def from_dict(cls, robot_description):
@@ -114,6 +215,22 @@ class Robot:
         robot.displayed_name = robot_description["displayed_name"]
         return robot
 
+    def add_start_coordinates(self, coordinates):
+        """
+        Add coordinates to robot's start coordinates, the last added
+        are used first when the robot is reinitialised.
+
+        Coordinates which are already in the list are moved to its end,
+        so the list never gets longer than the count of flags
+        and repair tiles on the board (plus the first start).
+        """
+        # A new list is set (not changed in place),
+        # so the change gets into the game log.
+        start_coordinates = [start for start in self.start_coordinates
+                             if start != coordinates]
+        start_coordinates.append(coordinates)
+        self.start_coordinates = start_coordinates
+
     def select_cards(self, state):
         """
         Set robot's program with chosen cards.
@@ -121,11 +238,14 @@ class Robot:
         and if robot didn´t choose all cards to his program,
         they are replaced by random cards.
         """
+        state.record_list(self.program)
+        state.record_list(self.dealt_cards)
         for program_index, dealt_card_index in enumerate(self.card_indexes):
             if self.program[program_index] is None and dealt_card_index is not None:
                 card = self.dealt_cards[dealt_card_index]
                 self.dealt_cards[dealt_card_index] = None
                 self.program[program_index] = card
+        state.record_attribute(self, "card_indexes")
         self.card_indexes = []
 
         available_cards = []
@@ -133,13 +253,14 @@ class Robot:
             card = self.dealt_cards.pop()
             if card is not None:
                 available_cards.append(card)
-        shuffle(available_cards)
+        state.shuffle(available_cards)
 
         for index, card in enumerate(self.program):
             if card is None:
                 card = available_cards.pop()
                 self.program[index] = card
 
+        state.record_list(state.past_deck, len(state.past_deck))
         state.past_deck.extend(available_cards)
         available_cards.clear()
 
@@ -157,7 +278,7 @@ class Robot:
         # In this case he walks 1 step in the direction opposite to the given one.
         # He can still move the other robots on the way.
         if distance < 0:
-            self.walk((-distance), state, direction.get_new_direction(Rotation.U_TURN),
+            self.walk((-distance), state, direction.opposite,
                       push_others=push_others)
         else:
             for step in range(distance):
@@ -170,15 +291,10 @@ class Robot:
                 # Check robots on the next tile before moving.
                 robot_in_the_way = state.check_robot_in_the_way(next_coordinates)
 
-                # Move robot in the way.
+                # Move robot in the way (with all robots in front of him),
+                # but don't log it as a separate action.
                 if robot_in_the_way:
-                    if push_others:
-                        # Move other robot, but don't log it as a separate action
-                        robot_in_the_way.walk(1, state, direction, log=False)
-                        # Check that robot moved.
-                        if robot_in_the_way.coordinates == next_coordinates:
-                            break
-                    else:
+                    if not push_others or not robot_in_the_way.push(direction, state):
                         break
 
                 # Robot walks to next coordinates.
@@ -191,6 +307,33 @@ class Robot:
                 if self.inactive:
                     break
 
+    def push(self, direction, state):
+        """
+        Push the robot and the whole chain of robots in front of him
+        one step in the direction.
+
+        The chain is found first, then the walls between its robots
+        and in front of the last one are checked. If there is a wall,
+        nobody moves and False is returned. Otherwise the robots move
+        from the front of the chain, every robot steps to a free tile
+        and can fall into a hole there.
+        """
+        chain = [self]
+        coordinates = self.coordinates
+        while True:
+            if not state.check_the_absence_of_a_wall(coordinates, direction):
+                return False
+            coordinates = get_next_coordinates(coordinates, direction)
+            robot_in_the_way = state.check_robot_in_the_way(coordinates)
+            if robot_in_the_way is None:
+                break
+            chain.append(robot_in_the_way)
+
+        for robot in reversed(chain):
+            robot.coordinates = get_next_coordinates(robot.coordinates, direction)
+            robot.fall_into_hole(state)
+        return True
+
     def move(self, direction, distance, state):
         """
         Move a robot to next coordinates according to direction of the move.
@@ -229,44 +372,27 @@ class Robot:
         """
 
         if self.coordinates != None:
-            for tile in state.get_tiles(self.coordinates):
+            for tile in state.grid.get_tiles(self.coordinates):
                 tile.kill_robot(state, self)
                 if self.inactive:
                     break
 
-    def shoot(self, state):
+    def shoot(self, state, robot_lines=None):
         """
         Shoot in robot's direction.
         If there is a wall on the way, the robot's laser stops (it can't pass it).
         If there is a robot on the way, he gets shot and the laser ends there.
         If a robot has activated Power Down for this register, he can't shoot.
         The check is performed from robot's position till the end of the board in robot's direction.
+        robot_lines: optional robots sorted in rows and columns
+        returned by get_robot_lines(), they are created if not given.
         """
 
         if not self.power_down:
-            distance_till_end = self.get_distance_to_board_end(state)
-
-            # First coordinates are robot's coordinates - wall must be checked
-            next_coordinates = self.coordinates
-
-            for step in range(distance_till_end):
-                # Check if there is a robot on the next coordinates.
-                # Skip this if the shooting robot's current coordinates are checked
-                if next_coordinates != self.coordinates:
-                    robot_in_the_way = state.check_robot_in_the_way(next_coordinates)
-
-                    # There is a robot, shoot him and break the cycle (only one gets shot).
-                    if robot_in_the_way:
-                        robot_in_the_way.be_damaged(state)
-                        break
-
-                # Check if there is a wall, if is: end of shot.
-                if not state.check_the_absence_of_a_wall(next_coordinates, self.direction):
-                    break
-
-                # No robots or walls on the coordinates, check one step further.
-                else:
-                    next_coordinates = get_next_coordinates(next_coordinates, self.direction)
+            robot_in_the_way = state.get_robot_in_sight(self.coordinates, self.direction, robot_lines)
+            # There is a robot, shoot him (only one gets shot).
+            if robot_in_the_way:
+                robot_in_the_way.be_damaged(state)
 
     def be_damaged(self, state, strength=1):
         """
@@ -294,6 +420,8 @@ class Robot:
         Clear robot attributes at the end of round.
         If robot has blocked cards, it is left in his program.
         """
+        state.record_list(self.program)
+        state.record_list(state.past_deck, len(state.past_deck))
         for index in range(self.unblocked_cards):
             card = self.program[index]
             state.past_deck.append(card)
@@ -316,15 +444,25 @@ class Robot:
         When the history of robot's own coordinates ends,
         iterate through the other start tiles coordinates.
         """
-        last_robot_starts = list(reversed(self.start_coordinates))
-        last_robot_starts.extend(state.start_coordinates)
-        for last_coordinates in last_robot_starts:
-            for robot in state.robots:
-                if robot.coordinates == last_coordinates:
-                    break
-            else:
-                self.coordinates = last_coordinates
-                break
+        if state.debug:
+            state.check_occupancy()
+        coordinates = self.get_free_start(state.occupancy, state.start_coordinates)
+        if coordinates is not None:
+            self.coordinates = coordinates
+
+    def get_free_start(self, occupied, start_coordinates):
+        """
+        Return the first coordinates from robot's start coordinates
+        (from the last one) and then from the start tiles coordinates,
+        which aren't occupied. Return None if all of them are occupied.
+
+        occupied: set (or dictionary) of occupied coordinates
+        start_coordinates: coordinates of the start tiles of the board
+        """
+        for coordinates in chain(reversed(self.start_coordinates), start_coordinates):
+            if coordinates not in occupied:
+                return coordinates
+        return None
 
     def select_blocked_cards_from_program(self):
         """
@@ -353,6 +491,8 @@ class Robot:
 
 
 class Card:
+    __slots__ = ("priority",)
+
     def __init__(self, priority):
         self.priority = priority  # int - to decide who goes first
 
@@ -377,6 +517,8 @@ class Card:
 
 
 class MovementCard(Card):
+    __slots__ = ("distance",)
+
     def __init__(self, priority, value):
         self.distance = value
         super().__init__(priority)
@@ -417,6 +559,8 @@ class MovementCard(Card):
 
 
 class RotationCard(Card):
+    __slots__ = ("rotation",)
+
     def __init__(self, priority, value):
         if isinstance(value, int):
             value = Rotation(value)
@@ -460,9 +604,64 @@ class RotationCard(Card):
         return RotationCard(priority, Rotation(rotation))
 
 
+class Checkpoint:
+    """
+    State's attributes at the moment of State.checkpoint().
+
+    Changes of robots and cards are in the state's journal,
+    the checkpoint keeps the position in it.
+    """
+    def __init__(self, state):
+        self.state = state
+        self.position = len(state.journal)
+        self.version = state.version
+        self.logged_version = state.logged_version
+        self.log_length = len(state.log)
+        self.winner_count = len(state.winners)
+        self.game_round = state.game_round
+
+    def __repr__(self):
+        return "<Checkpoint {}>".format(self.position)
+
+
 class State:
-    def __init__(self, board, robots):
+    # When debug is True, the index of robots' coordinates is cross-checked
+    # with robots' coordinates on every lookup.
+    debug = False
+
+    def __init__(self, board, robots, seed=None):
         self._board = board
+        # Every state has its own random generator used for shuffling cards,
+        # so the game with the same seed is always played the same way.
+        # Seed None means the generator is seeded from the system randomness.
+        self.seed = seed
+        self.random = Random(seed)
+        # Journal of changes - list of (function, arguments) which undo them,
+        # None when changes aren't recorded. See checkpoint() and rollback().
+        self.journal = None
+        # Information about the map and its compiled form are computed
+        # only once for the board, the state doesn't search the board.
+        self.map_info = board.info
+        self.grid = get_grid(board)
+        # Optional transitions.TransitionTable, None means the registers
+        # are always played step by step.
+        self.transitions = None
+        # Optional function compiled for the map by compiler.get_board_effects(),
+        # None means the board elements are applied by apply_board_effects().
+        self.board_effects = None
+        # Optional regions.RegionResolver, None means all robots
+        # play the register together.
+        self.regions = None
+        # Optional outcomes.OutcomeCache, None means the registers
+        # are always played.
+        self.outcomes = None
+        # Version is raised on every change of robots, see robot_changed().
+        self.version = 0
+        # 64-bit hash of robots' HASHED_ATTRIBUTES, it is updated
+        # on every change of them, see robot_changed().
+        self.state_hash = 0
+        self.logged_version = None
+        self._robots = []
         self.robots = robots
         self.tile_count = self.get_tile_count()
         self.present_deck = self.create_card_pack()
@@ -470,11 +669,178 @@ class State:
         self.game_round = 1
         self.winners = []
         self.flag_count = self.get_flag_count()
+        # Game log - list of entries, every entry is a tuple of robots'
+        # snapshots (see Robot.snapshot). Use log_as_dict() for sending.
         self.log = []
 
     def __repr__(self):
         return "<State {} {}>".format(self._board, self.robots)
 
+    @property
+    def board(self):
+        """
+        Return the game board (it mustn't be changed).
+        """
+        return self._board
+
+    @property
+    def robots(self):
+        return self._robots
+
+    @robots.setter
+    def robots(self, robots):
+        """
+        Set robots playing in the state and rebuild the index
+        of robots' coordinates.
+        """
+        if robots != self._robots:
+            self.version += 1
+        if self.journal is not None:
+            self.journal.append((setattr, (self, "robots", self._robots)))
+        for robot in self._robots:
+            robot._state = None
+        self._robots = robots
+        # Dictionary {coordinates: robot} of all robots on the board.
+        self.occupancy = {}
+        for robot in robots:
+            robot._state = self
+            if robot.coordinates is not None:
+                self.occupancy.setdefault(robot.coordinates, robot)
+        self.state_hash = get_robots_hash(robots)
+
+    def robot_changed(self, robot, name, old_value, new_value):
+        """
+        Called by the robot whenever one of his LOGGED_ATTRIBUTES changes.
+
+        Raise the version of the state, so record_log() knows there is
+        something new to record, and keep the index of robots' coordinates
+        and the state hash up to date.
+        """
+        if name != "start_coordinates":
+            # Robot looks the same with new start coordinates, they get
+            # into the game log with the next change of robots.
+            self.version += 1
+        if name == "coordinates":
+            self.update_occupancy(robot, old_value, new_value)
+        if name in HASHED_ATTRIBUTE_SET:
+            self.update_state_hash(robot, name, old_value, new_value)
+        if self.journal is not None:
+            self.journal.append((self.restore_robot_attribute, (robot, name, old_value)))
+
+    def restore_robot_attribute(self, robot, name, value):
+        """
+        Set robot's logged attribute back to the value when rolling back
+        (see rollback()), without raising the version of the state.
+        """
+        if name == "coordinates":
+            self.update_occupancy(robot, robot.coordinates, value)
+        if name in HASHED_ATTRIBUTE_SET:
+            self.update_state_hash(robot, name, getattr(robot, name), value)
+        setattr(robot, "_" + name, value)
+        robot._snapshot = None
+
+    def checkpoint(self):
+        """
+        Return checkpoint the state can be rolled back to with rollback().
+
+        From the first checkpoint on, changes of robots, cards, decks
+        and of the random generator are recorded in the journal,
+        so the rollback takes only as long as the changes since the checkpoint.
+        The board isn't copied, it never changes.
+        Use it for trying out cards, for example:
+
+            checkpoint = state.checkpoint()
+            state.apply_all_effects()
+            ...
+            state.rollback(checkpoint)
+        """
+        if self.journal is None:
+            self.journal = []
+        return Checkpoint(self)
+
+    def rollback(self, checkpoint):
+        """
+        Undo all changes of the state made after the checkpoint was taken.
+
+        The checkpoint stays valid, the state can be rolled back
+        to it again. Raise CheckpointError if the journal has been stopped
+        (see stop_journal()) or the state was already rolled back
+        to an earlier checkpoint.
+        """
+        journal = self.journal
+        if journal is None or checkpoint.state is not self or checkpoint.position > len(journal):
+            raise CheckpointError
+        # Undoing mustn't be recorded.
+        self.journal = None
+        while len(journal) > checkpoint.position:
+            function, arguments = journal.pop()
+            function(*arguments)
+        self.journal = journal
+        del self.log[checkpoint.log_length:]
+        del self.winners[checkpoint.winner_count:]
+        self.version = checkpoint.version
+        self.logged_version = checkpoint.logged_version
+        self.game_round = checkpoint.game_round
+
+    def stop_journal(self):
+        """
+        Stop recording changes, all checkpoints become invalid.
+        """
+        self.journal = None
+
+    def record_list(self, items, start=0):
+        """
+        Record items of the list from the start index to its end
+        in the journal (if it is on) before the list is changed in place.
+        Rollback puts them back in place of the items from the start index.
+        """
+        if self.journal is not None:
+            self.journal.append((items.__setitem__, (slice(start, None), items[start:])))
+
+    def record_attribute(self, item, name):
+        """
+        Record the attribute of the item in the journal (if it is on)
+        before a new value is set to it, see record_list().
+        """
+        if self.journal is not None:
+            self.journal.append((setattr, (item, name, getattr(item, name))))
+
+    def update_occupancy(self, robot, old_coordinates, new_coordinates):
+        """
+        Move robot in the index of robots' coordinates.
+        """
+        if old_coordinates is not None and self.occupancy.get(old_coordinates) is robot:
+            del self.occupancy[old_coordinates]
+        if new_coordinates is not None:
+            self.occupancy[new_coordinates] = robot
+
+    def update_state_hash(self, robot, name, old_value, new_value):
+        """
+        Replace the old value of robot's attribute in the state hash
+        with the new one.
+        """
+        self.state_hash ^= (get_hash_key(robot.name, name, old_value)
+                            ^ get_hash_key(robot.name, name, new_value))
+
+    def check_state_hash(self):
+        """
+        Compare the state hash with the hash computed from all robots.
+        If they don't match, raise StateHashError.
+        """
+        expected = get_robots_hash(self.robots)
+        if expected != self.state_hash:
+            raise StateHashError(expected, self.state_hash)
+
+    def check_occupancy(self):
+        """
+        Compare the index of robots' coordinates with robots' coordinates.
+        If they don't match, raise OccupancyIndexError.
+        """
+        expected = {robot.coordinates: robot for robot in reversed(self.robots)
+                    if robot.coordinates is not None}
+        if expected != self.occupancy:
+            raise OccupancyIndexError(expected, self.occupancy)
+
     @classmethod
     def whole_from_dict(cls, data):
         """
@@ -510,23 +876,39 @@ class State:
         return {"robots": [robot.as_dict() for robot in self.robots]}
 
     def record_log(self):
-        new_entry = self.robots_as_dict()
-        if self.log and self.log[-1] == new_entry:
-            # The new entry is the same as the previous one.
+        """
+        Add robots' snapshots to the game log.
+
+        If no robot has changed since the last entry (the version
+        of the state is the same), nothing is added.
+        """
+        if self.logged_version == self.version:
             return
-        self.log.append(new_entry)
+        self.logged_version = self.version
+        self.log.append(tuple(robot.snapshot() for robot in self.robots))
+
+    def log_as_dict(self, start=0):
+        """
+        Return game log entries from the start position
+        as dictionary for sending with server.
+        """
+        return {"log": [
+            {"robots": [snapshot_as_dict(snapshot) for snapshot in entry]}
+            for entry in self.log[start:]]}
 
     @classmethod
-    def get_start_state(cls, map_name, players=None):
+    def get_start_state(cls, map_name, players=None, seed=None):
         """
         Get start state of game.
 
         map_name: path to map file. Create board and robots on start tiles,
         initialize State object with them.
+        seed: seed of the state's random generator,
+        games with the same seed and programs are played the same way.
         """
         board = get_board(map_name)
         robots_start, start_coordinates = create_robots(board, players)
-        state = cls(board, robots_start)
+        state = cls(board, robots_start, seed)
         for robot in state.robots:
             state.deal_cards(robot)
         # Save the list of start tiles coordinates for robots
@@ -536,30 +918,18 @@ class State:
 
     def get_tile_count(self):
         """
-        From the board coordinates get the count of tiles
-        in horizontal (x) and vertical (y) ax.
+        Return the count of tiles in horizontal (x) and vertical (y) ax.
         """
-        x_set = set()
-        y_set = set()
-        for coordinate in self._board.keys():
-            x, y = coordinate
-            x_set.add(x)
-            y_set.add(y)
-        return len(x_set), len(y_set)
+        return self.map_info.width, self.map_info.height
 
     def get_tiles(self, coordinates):
         """
         Get tiles on requested coordinates.
 
         coordinates: tuple of x and y coordinate
-        Return a list of tiles or return hole tile if coordinates are out of the board.
+        Return a tuple of tiles or return hole tile if coordinates are out of the board.
         """
-        if coordinates in self._board:
-            return self._board[coordinates]
-        else:
-            # Coordinates are out of game board.
-            # Return hole tile.
-            return [HoleTile()]
+        return self.grid.get_tiles(coordinates)
 
     def get_active_robots(self):
         """
@@ -573,15 +943,50 @@ class State:
         """
         Check if there are robot on the next coordinates.
 
-        Return index of the robot on the way from given point.
+        Return the robot on the way from given point.
         It there are no robots, return None.
         """
-        # Check robots on the next tile.
-        for robot in self.robots:
-            if robot.coordinates == coordinates:
-                # Return robot that is in the way.
+        if self.debug:
+            self.check_occupancy()
+        return self.occupancy.get(coordinates)
+
+    def get_robot_in_sight(self, coordinates, direction, robot_lines=None):
+        """
+        Return the nearest robot in the given direction from coordinates
+        which is not hidden behind a wall.
+        If there is no such robot, return None.
+
+        robot_lines: optional robots sorted in rows and columns
+        returned by get_robot_lines(), they are created if not given.
+        """
+        if robot_lines is None:
+            robot_lines = get_robot_lines(self.occupancy)
+        rows, columns = robot_lines
+        distance = self.grid.get_sight(coordinates, direction)
+        x, y = coordinates
+        dx, dy = direction.coor_delta
+        if dx:
+            line, position, step = rows.get(y, []), x, dx
+        else:
+            line, position, step = columns.get(x, []), y, dy
+
+        # Look at the robots in the line one by one from the nearest.
+        # Robots killed during the laser phase are still in the line, skip them.
+        if step > 0:
+            index = bisect_right(line, position)
+        else:
+            index = bisect_left(line, position) - 1
+        while 0 <= index < len(line):
+            other_position = line[index]
+            if abs(other_position - position) > distance:
+                break
+            if dx:
+                robot = self.occupancy.get((other_position, y))
+            else:
+                robot = self.occupancy.get((x, other_position))
+            if robot is not None:
                 return robot
-        # There are no robots, return None
+            index += step
         return None
 
     def check_the_absence_of_a_wall(self, coordinates, direction):
@@ -594,25 +999,7 @@ class State:
         True - There isn't wall, robot can move.
         False - There is wall, robot can't move.
         """
-        old_tiles = self.get_tiles(coordinates)
-        # Current tile: Check wall in the direction of next move.
-        for tile in old_tiles:
-            move_from = tile.can_move_from(direction)
-            if not move_from:
-                # Current tile: There is a wall in the direction of the move.
-                return False
-
-        # There is no wall, so get next coordinates.
-        next_coordinates = get_next_coordinates(coordinates, direction)
-        # Get new list of tiles.
-        new_tiles = self.get_tiles(next_coordinates)
-        # Check wall on the next tile in the direction of the move.
-        for tile in new_tiles:
-            move_to = tile.can_move_to(direction)
-            if not move_to:
-                # Next tile: There is a wall in the direction of the move.
-                return False
-        return True
+        return self.grid.can_move(coordinates, direction)
 
     def move_belts(self):
         """
@@ -622,31 +1009,23 @@ class State:
         # First, express belts move robots by one tile (express attribute is set to True).
         # Then all belts move robots by one tile (express attribute is set to False).
         for express_belts in True, False:
+            if express_belts:
+                belts = self.grid.express_belts
+            else:
+                belts = self.grid.all_belts
             # Get robots next coordinates after move of conveyor belts
             robots_next_coordinates = self.get_next_coordinates_for_belts(express_belts)
             # Solve blocked robots (colliding and swapping robots)
-            for blocked_func in get_colliding_robots, get_swapping_robots:
-                while True:
-                    blocked_robots = blocked_func(robots_next_coordinates)
-                    if not blocked_robots:
-                        break
-                    else:
-                        # For blocked robots set next coordinates to their current.
-                        for robot in blocked_robots:
-                            robots_next_coordinates[robot] = robot.coordinates
+            stop_colliding_robots(robots_next_coordinates)
+            stop_swapping_robots(robots_next_coordinates)
 
             # All collision sorted, move robots to new coordinates
-            for robot in robots_next_coordinates:
-                if robot.coordinates != robots_next_coordinates[robot]:
-                    # Get direction of belt movement
-                    direction = get_direction_from_coordinates(
-                        robot.coordinates,
-                        robots_next_coordinates[robot]
-                    )
-                    # Check if the next tile is rotating belt.
-                    for tile in self.get_tiles(robots_next_coordinates[robot]):
-                        tile.rotate_robot_on_belt(robot, direction, self)
-                robot.coordinates = robots_next_coordinates[robot]
+            for robot, next_coordinates in robots_next_coordinates.items():
+                if robot.coordinates != next_coordinates:
+                    # Rotate robot if the next tile is rotating belt.
+                    for rotation in belts[robot.coordinates][1]:
+                        robot.rotate(rotation, self)
+                    robot.coordinates = next_coordinates
             self.record_log()
             for robot in self.robots:
                 robot.fall_into_hole(self)
@@ -658,16 +1037,17 @@ class State:
         express_belts: a boolean, True - for express belts, False - for all belts.
         Return a dictionary of robots as keys and their next coordinates as values.
         """
+        if express_belts:
+            belts = self.grid.express_belts
+        else:
+            belts = self.grid.all_belts
         robots_next_coordinates = {}
         for robot in self.get_active_robots():
-            for tile in self.get_tiles(robot.coordinates):
-                if tile.check_belts(express_belts):
-                    belt_direction = tile.direction.get_new_direction(tile.direction_out)
-                    if self.check_the_absence_of_a_wall(robot.coordinates, belt_direction):
-                        # Get next coordinates of robots on belts
-                        robots_next_coordinates[robot] = get_next_coordinates(
-                            robot.coordinates, belt_direction)
-                        break
+            belt = belts.get(robot.coordinates)
+            if belt is not None:
+                # Get next coordinates of robots on belts
+                robots_next_coordinates[robot] = belt[0]
+            else:
                 # Other robots will have the same coordinates
                 robots_next_coordinates[robot] = robot.coordinates
         return robots_next_coordinates
@@ -679,50 +1059,89 @@ class State:
         The method name is not entirely exact: the whole register phase actions
         take place (both tiles and robot's effects).
         """
+        self.apply_board_effects(register)
+        self.apply_robot_effects()
+
+    def apply_board_effects(self, register):
+        """
+        Apply effects of the board elements which move, rotate and shoot robots:
+        belts, pushers, gears and lasers.
+        The function compiled for the map (see compiler.py) is used, if it is set.
+        """
+        if self.board_effects is not None:
+            self.board_effects(self, register)
+            return
+
+        # Only robots standing on tiles of the phase are visited
+        # and phases with no tiles on the board are skipped.
+        grid = self.grid
 
         # Activate belts
-        self.move_belts()
+        if grid.all_belts:
+            self.move_belts()
+        else:
+            self.record_log()
 
         # Activate pusher
-        active_pusher = False
-        for robot in self.get_active_robots():
-            for tile in self.get_tiles(robot.coordinates):
-                if tile.push_robot(robot, self, register):
-                    active_pusher = True
-                if robot.inactive:
-                    break
-        if active_pusher:
-            self.record_log()
+        # PusherTile property register:
+        #  0 for even register number,
+        #  1 for odd register number.
+        pusher_cells = grid.pusher_cells[(register + 1) % 2]
+        if pusher_cells:
+            active_pusher = False
+            for robot in self.get_active_robots():
+                if robot.coordinates in pusher_cells:
+                    for tile in self.get_tiles(robot.coordinates):
+                        if tile.push_robot(robot, self, register):
+                            active_pusher = True
+                        if robot.inactive:
+                            break
+            if active_pusher:
+                self.record_log()
 
         # Activate gear
-        active_gear = False
-        for robot in self.get_active_robots():
-            for tile in self.get_tiles(robot.coordinates):
-                if tile.rotate_robot(robot, self):
-                    active_gear = True
-        if active_gear:
-            self.record_log()
+        if grid.gear_cells:
+            active_gear = False
+            for robot in self.get_active_robots():
+                if robot.coordinates in grid.gear_cells:
+                    for tile in self.get_tiles(robot.coordinates):
+                        if tile.rotate_robot(robot, self):
+                            active_gear = True
+            if active_gear:
+                self.record_log()
 
         # Activate laser
-        active_laser = False
-        for robot in self.get_active_robots():
-            for tile in self.get_tiles(robot.coordinates):
-                if tile.shoot_robot(robot, self):
-                    active_laser = True
-                if robot.inactive:
-                    break
-        if active_laser:
-            self.record_log()
+        if grid.laser_cells:
+            active_laser = False
+            for robot in self.get_active_robots():
+                if robot.coordinates in grid.laser_cells:
+                    for tile in self.get_tiles(robot.coordinates):
+                        if tile.shoot_robot(robot, self):
+                            active_laser = True
+                        if robot.inactive:
+                            break
+            if active_laser:
+                self.record_log()
+
+    def apply_robot_effects(self):
+        """
+        Apply the end of the register phase: robots shoot
+        and collect flags, robots on repair tiles get new start coordinates.
+        """
+        grid = self.grid
 
         # Activate robot laser
+        robot_lines = get_robot_lines(self.occupancy)
         for robot in self.get_active_robots():
-            robot.shoot(self)
+            robot.shoot(self, robot_lines)
 
         # Collect flags, repair robots
-        for robot in self.get_active_robots():
-            for tile in self.get_tiles(robot.coordinates):
-                tile.collect_flag(robot)
-                tile.set_new_start(robot)
+        if grid.checkpoint_cells:
+            for robot in self.get_active_robots():
+                if robot.coordinates in grid.checkpoint_cells:
+                    for tile in self.get_tiles(robot.coordinates):
+                        tile.collect_flag(robot)
+                        tile.set_new_start(robot)
 
     def set_robots_for_new_turn(self):
         """
@@ -731,16 +1150,40 @@ class State:
         will reboot on start coordinates.
         """
         self.robots = [robot for robot in self.robots if robot.permanent_damages < 10]
+        respawns = self.plan_respawns()
         for robot in self.robots:
-            for tile in self.get_tiles(robot.coordinates):
-                tile.repair_robot(robot, self)
+            if not robot.inactive:
+                for tile in self.get_tiles(robot.coordinates):
+                    tile.repair_robot(robot, self)
             if robot.inactive:
                 robot.damages = 0
                 # Robot will now ressurect at the first free
                 # start coordinates he stepped on during the game.
-                robot.find_free_start(self)
+                coordinates = respawns[robot]
+                if coordinates is not None:
+                    robot.coordinates = coordinates
                 self.record_log()
 
+    def plan_respawns(self):
+        """
+        Return dictionary {robot: coordinates} with start coordinates
+        for all inactive robots (None if there is no free one).
+
+        Robots are resolved in their order in one pass, every robot
+        takes the first free coordinates (see Robot.get_free_start),
+        the chosen coordinates aren't free for the next robots.
+        """
+        if self.debug:
+            self.check_occupancy()
+        occupied = set(self.occupancy)
+        respawns = {}
+        for robot in self.robots:
+            if robot.inactive:
+                coordinates = robot.get_free_start(occupied, self.start_coordinates)
+                respawns[robot] = coordinates
+                occupied.add(coordinates)
+        return respawns
+
     def get_robots_ordered_by_cards_priority(self, register):
         """
         Get all the active robots, sort them according to the priority of their
@@ -772,8 +1215,29 @@ class State:
         perform robot's cards effects and tile effects on a given game state.
         At the end ressurect the inactive robots to their starting coordinates.
         registers: default iterations count is 5, can be changed for testing purposes.
+        With the cache of outcomes (see outcomes.py), known rounds aren't played again.
+        """
+        if self.outcomes is not None:
+            self.outcomes.apply_all_effects(self, registers)
+        else:
+            self.play_registers(registers)
+
+    def play_registers(self, registers=5):
+        """
+        Play the registers and ressurect the inactive robots,
+        see apply_all_effects().
         """
         for register in range(registers):
+            # With the table of single-robot transitions, the cards and board
+            # effects are applied at once when robots can't meet.
+            if self.transitions is not None and self.transitions.apply_register(self, register):
+                self.apply_robot_effects()
+                continue
+            # With the region resolver, robots which can't meet
+            # play the register in separate clusters.
+            if self.regions is not None and self.regions.apply_register(self, register):
+                continue
+
             # try -  except was introduced for devel purposes - it may happen that
             # robots have no card on hand and we still want to try loading the game
             try:
@@ -812,29 +1276,18 @@ class State:
         Create and shuffle pack of cards: 42 movement and 42 rotation cards
         with different values and priorities.
         """
-        movement_cards = [(-1, 6, 250),
-                          (1, 18, 300),
-                          (2, 12, 400),
-                          (3, 6, 500),
-                          ]
-        rotation_cards = [(Rotation.U_TURN, 6, 50),
-                          (Rotation.LEFT, 18, 100),
-                          (Rotation.RIGHT, 18, 200),
-                          ]
-        present_deck = []
-
-        for movement, cards_count, first_number in movement_cards:
-            for i in range(cards_count):
-                # [MovementCard(690, -1)...][]
-                present_deck.append(MovementCard(first_number + i*5, movement))
-
-        for rotation, cards_count, first_number in rotation_cards:
-            for i in range(cards_count):
-                # [RotationCard(865, Rotation.LEFT)....]
-                present_deck.append(RotationCard(first_number + i*5, rotation))
-        shuffle(present_deck)
+        present_deck = create_cards()
+        self.shuffle(present_deck)
         return present_deck
 
+    def shuffle(self, cards):
+        """
+        Shuffle the cards in place with the state's random generator.
+        """
+        if self.journal is not None:
+            self.journal.append((self.random.setstate, (self.random.getstate(),)))
+        self.random.shuffle(cards)
+
     def deal_cards(self, robot):
         """
         Deal the cards for robot - he gets one card less for every damage he's got.
@@ -842,12 +1295,16 @@ class State:
         """
         # Maximum number of cards is 9.
         # Robot's damages reduce the count of dealt cards - each damage one card.
+        self.record_attribute(robot, "dealt_cards")
         robot.dealt_cards = []
         for number in range(MAX_CARD_COUNT-robot.damages-robot.permanent_damages):
             if not self.present_deck:
+                self.record_list(self.present_deck)
+                self.record_list(self.past_deck)
                 self.present_deck.extend(self.past_deck)
                 self.past_deck.clear()
-                shuffle(self.present_deck)
+                self.shuffle(self.present_deck)
+            self.record_list(self.present_deck, len(self.present_deck) - 1)
             robot.dealt_cards.append(self.present_deck.pop())
 
     def cards_and_game_round_as_dict(self, cards, blocked_cards):
@@ -887,15 +1344,7 @@ class State:
         """
         Return number of flags on the map.
         """
-        flag_count = 0
-        weight, height = self.tile_count
-        for x in range(0, weight):
-            for y in range(0, height):
-                tiles = self.get_tiles((x, y))
-                for tile in tiles:
-                    if tile.type == "flag":
-                        flag_count += 1
-        return flag_count
+        return self.map_info.flag_count
 
     def check_winner(self):
         """
@@ -918,6 +1367,44 @@ def get_robot_names():
     return robot_names
 
 
+# Random keys of the state hash, see get_hash_key().
+hash_keys = {}
+
+
+def get_hash_key(robot_name, name, value):
+    """
+    Return 64-bit random key for the value of robot's attribute.
+
+    The state hash is XOR of the keys of all robots' HASHED_ATTRIBUTES
+    (Zobrist hashing), so it can be changed for every single attribute.
+    Keys are derived from the names and values (not from Python's hash(),
+    which changes between processes), so the server and the clients
+    compute the same hashes.
+    """
+    key = robot_name, name, value
+    hash_key = hash_keys.get(key)
+    if hash_key is None:
+        digest = blake2b(repr(key).encode("utf-8"), digest_size=8).digest()
+        hash_key = int.from_bytes(digest, "little")
+        hash_keys[key] = hash_key
+    return hash_key
+
+
+def get_robots_hash(robots):
+    """
+    Return the state hash of the robots computed from scratch.
+
+    Robots can be backend.Robot or anything with the same
+    HASHED_ATTRIBUTES (for example client_state.RobotView).
+    The order of robots doesn't matter.
+    """
+    state_hash = 0
+    for robot in robots:
+        for name in HASHED_ATTRIBUTES:
+            state_hash ^= get_hash_key(robot.name, name, getattr(robot, name))
+    return state_hash
+
+
 def get_start_tiles(board, tile_type="start"):
     """
     Get initial tiles for robots. It can be either start or stop tiles.
@@ -931,18 +1418,12 @@ def get_start_tiles(board, tile_type="start"):
     Number of start tiles depends on the optional number of players.
     OrderedDict is a structure that ensures the dictionary is stored
     in the order of the new keys being added.
+    The tiles are found when the board is loaded (see loading.MapInfo),
+    the returned dictionary is shared and mustn't be changed.
     """
-
-    robot_tiles = {}
-    for coordinate, tiles in board.items():
-        for tile in tiles:
-            if tile.type == tile_type:
-                robot_tiles[tile.number] = {"coordinates": coordinate,
-                                            "tile_direction": tile.direction}
-
-    # Sort created dictionary by the first element - start tile number
-    robot_tiles = OrderedDict(sorted(robot_tiles.items(), key=lambda stn: stn[0]))
-    return robot_tiles
+    if tile_type == "stop":
+        return board.info.stop_tiles
+    return board.info.start_tiles
 
 
 def create_robots(board, players=None):
@@ -975,40 +1456,129 @@ def create_robots(board, players=None):
     return robots_on_start, tiles_coordinates
 
 
-def get_colliding_robots(robots):
+def snapshot_as_dict(snapshot):
+    """
+    Return robot's snapshot (see Robot.snapshot) as dictionary
+    for sending with server.
     """
-    Get a list of robots, who would collide during belt movement.
+    (name, coordinates, lives, flags, damages, permanent_damages, power_down,
+     direction, start_coordinates, selection_confirmed, winner,
+     displayed_name) = snapshot
+    all_damages = damages + permanent_damages
+    if all_damages > 4:
+        unblocked_cards = MAX_CARD_COUNT - all_damages
+    else:
+        unblocked_cards = 5
+    return {"robot_data":
+            {"name": name, "coordinates": coordinates,
+             "lives": lives, "flags": flags,
+             "damages": damages,
+             "permanent_damages": permanent_damages,
+             "power_down": power_down,
+             "direction": direction.value,
+             "start_coordinates": list(start_coordinates),
+             "selection_confirmed": selection_confirmed,
+             "unblocked_cards": unblocked_cards,
+             "winner": winner,
+             "displayed_name": displayed_name}}
+
+
+def create_cards():
     """
-    colliding_robots = []
-    for robot in robots.keys():
-        # Check if there are duplicate values of next coordinates.
-        if is_duplicate(robots, robot):
-            colliding_robots.append(robot)
-    return colliding_robots
+    Return list of all cards of the game (not shuffled):
+    42 movement and 42 rotation cards with different values and priorities.
+    """
+    movement_cards = [(-1, 6, 250),
+                      (1, 18, 300),
+                      (2, 12, 400),
+                      (3, 6, 500),
+                      ]
+    rotation_cards = [(Rotation.U_TURN, 6, 50),
+                      (Rotation.LEFT, 18, 100),
+                      (Rotation.RIGHT, 18, 200),
+                      ]
+    cards = []
+
+    for movement, cards_count, first_number in movement_cards:
+        for i in range(cards_count):
+            # [MovementCard(690, -1)...][]
+            cards.append(MovementCard(first_number + i*5, movement))
+
+    for rotation, cards_count, first_number in rotation_cards:
+        for i in range(cards_count):
+            # [RotationCard(865, Rotation.LEFT)....]
+            cards.append(RotationCard(first_number + i*5, rotation))
+    return cards
+
+
+def get_robot_lines(occupancy):
+    """
+    Return robots' positions sorted in rows and columns of the board.
 
+    occupancy: dictionary of robots' coordinates (State.occupancy)
+    Return a tuple of dictionaries {y: sorted x coordinates of robots in the row}
+    and {x: sorted y coordinates of robots in the column}.
+    """
+    rows = {}
+    columns = {}
+    for x, y in occupancy:
+        rows.setdefault(y, []).append(x)
+        columns.setdefault(x, []).append(y)
+    for line in (*rows.values(), *columns.values()):
+        line.sort()
+    return rows, columns
 
-def is_duplicate(data, key):
+
+def stop_colliding_robots(robots_next_coordinates):
     """
-    For input key check if its value is duplicate of other values in dictionary.
+    Stop robots, who would collide during belt movement.
+
+    robots_next_coordinates: a dictionary of robots as keys and their next
+    coordinates as values, returned by get_next_coordinates_for_belts().
+    All robots going to the same coordinates get their current coordinates
+    as next ones. A stopped robot can collide with another robot going
+    to his tile - these collisions are solved too.
     """
-    value = data[key]
-    for current_key, current_value in data.items():
-        if current_value == value and current_key != key:
-            return True
-    return False
+    # Dictionary {next coordinates: list of robots going there}
+    targets = {}
+    for robot, next_coordinates in robots_next_coordinates.items():
+        targets.setdefault(next_coordinates, []).append(robot)
+
+    collisions = [coordinates for coordinates, robots in targets.items() if len(robots) > 1]
+    while collisions:
+        coordinates = collisions.pop()
+        robots = targets[coordinates]
+        if len(robots) < 2:
+            continue
+        # Only the robot standing on the coordinates stays going there.
+        targets[coordinates] = [robot for robot in robots if robot.coordinates == coordinates]
+        for robot in robots:
+            if robot.coordinates != coordinates:
+                robots_next_coordinates[robot] = robot.coordinates
+                staying_robots = targets.setdefault(robot.coordinates, [])
+                staying_robots.append(robot)
+                if len(staying_robots) == 2:
+                    collisions.append(robot.coordinates)
 
 
-def get_swapping_robots(robots):
+def stop_swapping_robots(robots_next_coordinates):
     """
-    Get list of robots, who would switch coordinates during belt movement.
+    Stop robots, who would switch coordinates during belt movement.
+
+    robots_next_coordinates: a dictionary of robots as keys and their next
+    coordinates as values, returned by get_next_coordinates_for_belts().
+    Swapping robots get their current coordinates as next ones.
     """
+    # Dictionary {current coordinates: robot}
+    robots_by_coordinates = {robot.coordinates: robot for robot in robots_next_coordinates}
     swapping_robots = []
-    for robot1, next_coordinates1 in robots.items():
-        for robot2, next_coordinates2 in robots.items():
-            if robot1 != robot2:
-                if robot1.coordinates == next_coordinates2 and robot2.coordinates == next_coordinates1:
-                    swapping_robots.append(robot1)
-    return swapping_robots
+    for robot, next_coordinates in robots_next_coordinates.items():
+        other_robot = robots_by_coordinates.get(next_coordinates)
+        if (other_robot is not None and other_robot is not robot
+                and robots_next_coordinates[other_robot] == robot.coordinates):
+            swapping_robots.append(robot)
+    for robot in swapping_robots:
+        robots_next_coordinates[robot] = robot.coordinates
 
 
 def get_direction_from_coordinates(start_coordinates, stop_coordinates):
@@ -1020,6 +1590,4 @@ def get_direction_from_coordinates(start_coordinates, stop_coordinates):
     x_start, y_start = start_coordinates
 
     delta = (x_stop - x_start, y_stop - y_start)
-    for direction in list(Direction):
-        if direction.coor_delta == delta:
-            return direction
+    return DIRECTIONS_BY_DELTA.get(delta)
@@ -11,7 +11,7 @@ from time import monotonic
 
 from interface_frontend import draw_interface, create_window, handle_text, handle_click
 from interface import InterfaceState
-from backend import State
+from client_state import GameView
 from util_network import tick_asyncio
 
 
@@ -117,14 +117,15 @@ class Interface:
         Set game attributes using data from server message:
         - create game state, call set_robots.
         """
-        self.game_state = State.whole_from_dict(message)
+        self.game_state = GameView.from_dict(message)
         self.set_robots(message["game_state"], robot_name, own_robot_name)
 
     def set_robots(self, message, robot_name, own_robot_name):
         """
         Set robots, players and self robot using data from sent message.
+        Robots are updated in place.
         """
-        self.game_state.robots = self.game_state.robots_from_dict(message)
+        self.game_state.update_robots(message)
         for robot in self.game_state.robots:
             if robot.name == robot_name:
                 self.interface_state.robot = robot
@@ -8,7 +8,7 @@ import click
 from time import monotonic
 from util_network import tick_asyncio
 
-from backend import State
+from client_state import GameView, robots_from_dict
 from frontend import draw_state, create_window
 
 # How long one state from the log should be displayed (in seconds)
@@ -26,9 +26,6 @@ class Receiver:
         # Log of states to display in the future
         self.log_to_play = []
 
-        # Starting point of the current animation
-        self.last_robots = None
-
         # Time at which the current animation started
         self.animation_start = 0
 
@@ -44,14 +41,9 @@ class Receiver:
             animation_pos = 1
         draw_state(
             self.state, self.winner_time, self.available_robots, self.window,
-            last_robots=self.last_robots, animation_pos=animation_pos,
+            animation_pos=animation_pos,
         )
 
-    def reset_last_robots(self):
-        """Set the starting point of the animation to the current state.
-        """
-        self.last_robots = {robot.name: robot for robot in self.state.robots}
-
     async def tick_log(self):
         """
         Set the game state for the first element from the recorded game log
@@ -59,8 +51,6 @@ class Receiver:
         After the given delay (in seconds), repeat.
         """
         while True:
-            if self.state:
-                self.reset_last_robots()
             if self.log_to_play:
                 self.animation_start = monotonic()
                 new_state = self.log_to_play.pop(0)
@@ -68,7 +58,9 @@ class Receiver:
                     if self.winner_time == 0:
                         self.winner_time = monotonic()
                 else:
-                    self.state.robots = self.state.robots_from_dict(new_state)
+                    # Robots keep their previous position in robot.last,
+                    # the animation starts there.
+                    self.state.update_robots(new_state)
             await asyncio.sleep(LOG_FRAME_TIME)
 
     async def get_game_state(self):
@@ -83,12 +75,11 @@ class Receiver:
                 async for message in ws:
                     message = message.json()
                     if "game_state" in message:
-                        self.state = State.whole_from_dict(message)
-                        self.reset_last_robots()
+                        self.state = GameView.from_dict(message)
                         if self.window is None:
                             self.window = create_window(self.state, self.window_draw)
                     if "available_robots" in message:
-                        self.available_robots = self.state.robots_from_dict({"robots": message["available_robots"]})
+                        self.available_robots = robots_from_dict({"robots": message["available_robots"]})
                     if 'log' in message:
                         self.log_to_play.extend(message['log'])
                     if "winner" in message:
@@ -0,0 +1,157 @@
+"""
+Client state contains read-only view of the game for the clients.
+
+Clients only draw the game, they don't need the whole backend State
+(card pack, grid, game log). The view decodes only the drawn data
+from server messages and updates robots in place.
+"""
+from backend import Card, get_robots_hash
+from loading import board_from_data
+from util_backend import Direction
+
+
+class RobotPosition:
+    """
+    Robot's coordinates, direction and damages before the last update,
+    the receiver animates the robot from them.
+    """
+    __slots__ = ("coordinates", "direction", "damages")
+
+    def __repr__(self):
+        return "<RobotPosition {} {} Damages: {}>".format(
+            self.coordinates, self.direction, self.damages)
+
+
+class RobotView:
+    """
+    Robot's attributes drawn by the clients.
+
+    last: RobotPosition before the last update, it is created once
+    and changed in place
+    """
+    __slots__ = (
+        "name", "displayed_name", "coordinates", "direction", "lives", "flags",
+        "damages", "permanent_damages", "power_down", "selection_confirmed",
+        "winner", "last",
+    )
+
+    def __init__(self, robot_description):
+        self.name = robot_description["robot_data"]["name"]
+        self.last = RobotPosition()
+        self.coordinates = self.direction = self.damages = None
+        self.update(robot_description)
+        # New robot isn't animated, he starts where he is.
+        self.keep_position()
+
+    def __repr__(self):
+        return "<RobotView {} {} {} Lives: {} Flags: {} Damages: {}>".format(
+            self.name, self.direction, self.coordinates, self.lives, self.flags,
+            self.damages)
+
+    @property
+    def inactive(self):
+        """
+        Return True if robot is inactive (not on the game board).
+        """
+        return self.coordinates is None
+
+    def keep_position(self):
+        """
+        Remember robot's coordinates, direction and damages in self.last.
+        """
+        last = self.last
+        last.coordinates = self.coordinates
+        last.direction = self.direction
+        last.damages = self.damages
+
+    def update(self, robot_description):
+        """
+        Set robot's attributes from JSON data received from server
+        (see backend.Robot.as_dict).
+        The previous position is kept in self.last.
+        """
+        self.keep_position()
+        robot_data = robot_description["robot_data"]
+        coordinates = robot_data["coordinates"]
+        if coordinates is not None:
+            coordinates = tuple(coordinates)
+        self.coordinates = coordinates
+        self.direction = Direction(robot_data["direction"])
+        self.displayed_name = robot_data["displayed_name"]
+        self.lives = robot_data["lives"]
+        self.flags = robot_data["flags"]
+        self.damages = robot_data["damages"]
+        self.permanent_damages = robot_data["permanent_damages"]
+        self.power_down = robot_data["power_down"]
+        self.selection_confirmed = robot_data["selection_confirmed"]
+        self.winner = robot_data["winner"]
+
+
+class GameView:
+    """
+    Game state drawn by the clients.
+
+    board: game board (see loading.board_from_data)
+    tile_count: count of tiles in horizontal (x) and vertical (y) ax
+    flag_count: number of flags on the map
+    robots: list of RobotViews
+    winners: displayed names of the winners
+    game_round: number of the current game round
+    """
+    def __init__(self, board, robots):
+        self.board = board
+        self.tile_count = board.info.width, board.info.height
+        self.flag_count = board.info.flag_count
+        self.robots = robots
+        self.winners = []
+        self.game_round = 1
+
+    def __repr__(self):
+        return "<GameView {} {}>".format(self.tile_count, self.robots)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Create game view from JSON data received from server
+        (see backend.State.whole_as_dict).
+        """
+        board = board_from_data(data["game_state"]["board"])
+        return cls(board, robots_from_dict(data["game_state"]))
+
+    def update_robots(self, data):
+        """
+        Update robots with data sent from server.
+
+        Robots which are already known are changed in place,
+        robots which aren't in the data any more are removed.
+        """
+        known_robots = {robot.name: robot for robot in self.robots}
+        robots = []
+        for robot_description in data["robots"]:
+            robot = known_robots.get(robot_description["robot_data"]["name"])
+            if robot is None:
+                robot = RobotView(robot_description)
+            else:
+                robot.update(robot_description)
+            robots.append(robot)
+        self.robots = robots
+
+    def get_state_hash(self):
+        """
+        Return hash of robots, it is the same as State.state_hash
+        of the server's state with the same robots.
+        """
+        return get_robots_hash(self.robots)
+
+    def cards_from_dict(self, cards):
+        """
+        Create a list of card instances from dictionary given as an argument.
+        """
+        return [Card.from_dict(card) for card in cards]
+
+
+def robots_from_dict(data):
+    """
+    Return list of RobotViews with data sent from server.
+    """
+    return [RobotView(robot_description) for robot_description in data["robots"]]
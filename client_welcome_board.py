@@ -10,7 +10,7 @@ import aiohttp
 import pyglet
 import click
 
-from backend import State
+from client_state import GameView, robots_from_dict
 from util_network import tick_asyncio
 from welcome_board_frontend import create_window, draw_board, handle_click
 from client_interface import run_from_welcome_board as interface_main
@@ -76,7 +76,7 @@ class WelcomeBoard:
                 async for message in ws:
                     message = message.json()
                     if "game_state" in message:
-                        self.state = State.whole_from_dict(message)
+                        self.state = GameView.from_dict(message)
                         if self.window is None:
                             self.window = create_window(
                                 self.window_draw,
@@ -85,7 +85,7 @@ class WelcomeBoard:
                                 self.on_text_motion,
                             )
                     if "available_robots" in message:
-                        self.available_robots = self.state.robots_from_dict({"robots": message["available_robots"]})
+                        self.available_robots = robots_from_dict({"robots": message["available_robots"]})
 
 
 @click.command()
@@ -0,0 +1,238 @@
+"""
+Compiler turns the board elements of a map into a Python function.
+
+State.apply_board_effects() asks every tile on robots' coordinates
+what it does (belts, pushers, gears and lasers). The compiler writes
+the source of a function for one map, where these questions are already
+answered: the tiles are replaced by tables of coordinates
+and the phases the map hasn't got are left out.
+
+The compiled function is opt-in, set it to the state:
+
+    state.board_effects = get_board_effects(state.grid)
+
+State.apply_board_effects() stays the reference, the compiled function
+gives the same robots and the same game log.
+Functions are cached by the hash of their source (the map hash),
+so maps with the same board elements share one function.
+"""
+from hashlib import blake2b
+
+from backend import stop_colliding_robots, stop_swapping_robots
+from tile import GearTile, HoleTile, LaserTile, PusherTile
+from util_backend import Direction, Rotation
+
+
+# Compiled functions, {map hash: function}, see get_board_effects().
+compiled_functions = {}
+# Functions of grids which were already compiled, {grid: function}.
+grid_functions = {}
+
+
+def get_board_effects(grid):
+    """
+    Return the compiled function apply_board_effects(state, register)
+    for the grid (see grid.get_grid).
+    """
+    function = grid_functions.get(grid)
+    if function is None:
+        source = generate_source(grid)
+        map_hash = get_map_hash(source)
+        function = compiled_functions.get(map_hash)
+        if function is None:
+            function = compile_source(source, map_hash)
+            compiled_functions[map_hash] = function
+        grid_functions[grid] = function
+    return function
+
+
+def get_map_hash(source):
+    """
+    Return hash of the compiled source, it is the same for maps
+    with the same board elements.
+    """
+    return blake2b(source.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def compile_source(source, map_hash):
+    """
+    Compile the source and return its function apply_board_effects.
+    """
+    namespace = {
+        "Direction": Direction,
+        "Rotation": Rotation,
+        "stop_colliding_robots": stop_colliding_robots,
+        "stop_swapping_robots": stop_swapping_robots,
+    }
+    code = compile(source, "<board effects {}>".format(map_hash), "exec")
+    exec(code, namespace)
+    return namespace["apply_board_effects"]
+
+
+def literal(value):
+    """
+    Return Python source of the value (tuples, dictionaries, sets,
+    numbers, None, directions and rotations).
+    """
+    if isinstance(value, (Direction, Rotation)):
+        return "{}.{}".format(type(value).__name__, value.name)
+    if isinstance(value, tuple):
+        if len(value) == 1:
+            return "({},)".format(literal(value[0]))
+        return "({})".format(", ".join(literal(item) for item in value))
+    if isinstance(value, dict):
+        items = sorted(value.items())
+        return "{{{}}}".format(", ".join(
+            "{}: {}".format(literal(key), literal(item)) for key, item in items))
+    if isinstance(value, (set, frozenset)):
+        if not value:
+            return "frozenset()"
+        return "frozenset({{{}}})".format(", ".join(literal(item) for item in sorted(value)))
+    return repr(value)
+
+
+def get_tables(grid):
+    """
+    Return dictionary of the tables of the board elements of the grid.
+
+    holes: coordinates of holes
+    pushers: two dictionaries (for even and odd register number)
+    {coordinates: tuple of directions robot is pushed to}
+    gears: {coordinates: tuple of rotations}
+    lasers: {coordinates: tuple of (strength, coordinates of the beam
+    which can stop the laser)}
+    """
+    holes = set()
+    pushers = ({}, {})
+    gears = {}
+    lasers = {}
+    for cell, tiles in enumerate(grid.tiles):
+        coordinates = grid.coordinates(cell)
+        for tile in tiles:
+            if isinstance(tile, HoleTile):
+                holes.add(coordinates)
+            elif isinstance(tile, PusherTile):
+                pusher = pushers[tile.register]
+                pusher[coordinates] = pusher.get(coordinates, ()) + (tile.direction.opposite,)
+            elif isinstance(tile, GearTile):
+                gears[coordinates] = gears.get(coordinates, ()) + (tile.move_direction,)
+            elif isinstance(tile, LaserTile):
+                beam_cells = ()
+                if not tile.start:
+                    beam, position = grid.get_laser_beam(coordinates, tile.direction)
+                    if beam is not None:
+                        beam_cells = tuple(beam.cells[:position])
+                lasers[coordinates] = (lasers.get(coordinates, ())
+                                       + ((tile.laser_strength, beam_cells),))
+    return {"holes": holes, "pushers": pushers, "gears": gears, "lasers": lasers}
+
+
+def generate_source(grid):
+    """
+    Return Python source of the function apply_board_effects(state, register)
+    which does the same as State.apply_board_effects on the grid.
+    """
+    tables = get_tables(grid)
+    lines = [
+        "WIDTH = {}".format(grid.width),
+        "HEIGHT = {}".format(grid.height),
+        "HOLES = {}".format(literal(tables["holes"])),
+        "EXPRESS_BELTS = {}".format(literal(grid.express_belts)),
+        "ALL_BELTS = {}".format(literal(grid.all_belts)),
+        "PUSHERS = {}".format(literal(tables["pushers"])),
+        "GEARS = {}".format(literal(tables["gears"])),
+        "LASERS = {}".format(literal(tables["lasers"])),
+        "",
+        "",
+        "def apply_board_effects(state, register):",
+        "    robots = state.robots",
+    ]
+    if grid.all_belts:
+        for belts in "EXPRESS_BELTS", "ALL_BELTS":
+            lines.extend(BELTS_SOURCE.format(belts=belts).splitlines())
+    else:
+        lines.append("    state.record_log()")
+    if any(tables["pushers"]):
+        lines.extend(PUSHERS_SOURCE.splitlines())
+    if tables["gears"]:
+        lines.extend(GEARS_SOURCE.splitlines())
+    if tables["lasers"]:
+        lines.extend(LASERS_SOURCE.splitlines())
+    return "\n".join(lines) + "\n"
+
+
+# Parts of the compiled function, they follow State.apply_board_effects
+# and the methods of tiles it calls.
+
+BELTS_SOURCE = """\
+    robots_next_coordinates = {{}}
+    for robot in robots:
+        coordinates = robot.coordinates
+        if coordinates is not None:
+            belt = {belts}.get(coordinates)
+            robots_next_coordinates[robot] = coordinates if belt is None else belt[0]
+    stop_colliding_robots(robots_next_coordinates)
+    stop_swapping_robots(robots_next_coordinates)
+    for robot, next_coordinates in robots_next_coordinates.items():
+        if robot.coordinates != next_coordinates:
+            for rotation in {belts}[robot.coordinates][1]:
+                robot.rotate(rotation, state)
+            robot.coordinates = next_coordinates
+    state.record_log()
+    for robot in robots:
+        coordinates = robot.coordinates
+        if coordinates is not None:
+            x, y = coordinates
+            if coordinates in HOLES or not (0 <= x < WIDTH and 0 <= y < HEIGHT):
+                robot.die(state)
+"""
+
+PUSHERS_SOURCE = """\
+    pushers = PUSHERS[(register + 1) % 2]
+    if pushers:
+        active_pusher = False
+        for robot in robots:
+            if robot.coordinates is None:
+                continue
+            directions = pushers.get(robot.coordinates)
+            if directions is not None:
+                for direction in directions:
+                    robot.move(direction, 1, state)
+                    active_pusher = True
+                    if robot.coordinates is None:
+                        break
+        if active_pusher:
+            state.record_log()
+"""
+
+GEARS_SOURCE = """\
+    active_gear = False
+    for robot in robots:
+        if robot.coordinates is None:
+            continue
+        rotations = GEARS.get(robot.coordinates)
+        if rotations is not None:
+            for rotation in rotations:
+                robot.rotate(rotation, state)
+            active_gear = True
+    if active_gear:
+        state.record_log()
+"""
+
+LASERS_SOURCE = """\
+    active_laser = False
+    occupancy = state.occupancy
+    for robot in robots:
+        if robot.coordinates is None:
+            continue
+        lasers = LASERS.get(robot.coordinates)
+        if lasers is not None:
+            for strength, beam_cells in lasers:
+                if occupancy.keys().isdisjoint(beam_cells):
+                    robot.be_damaged(state, strength)
+                    active_laser = True
+                if robot.coordinates is None:
+                    break
+    if active_laser:
+        state.record_log()
+"""
@@ -43,26 +43,29 @@ def load_tiles(state):
     """
     Return list of sprites of tiles.
 
-    state: State object containing game board and robots
+    state: State or GameView object containing game board and robots
     """
     tile_sprites = []
-    for coordinate, tiles in state._board.items():
+    for coordinate, tiles in state.board.items():
         sprites = create_tile_sprites(coordinate, tiles)
         tile_sprites.extend(sprites)
     return tile_sprites
 
 
-def load_robots(state, last_robots, animation_pos):
+def load_robots(state, animation_pos):
     """
     Return list of sprites of robots.
 
     state: State object containing game board and robots
+    animation_pos: None for robots without animation
     """
     robot_sprites = []
     # Only active robots will be drawn.
     for robot in state.robots:
-        last_robot = last_robots.get(robot.name, robot)
-        robot_sprite = create_robot_sprite(robot, last_robot, animation_pos)
+        if animation_pos is None:
+            robot_sprite = create_robot_sprite(robot, robot, 1)
+        else:
+            robot_sprite = create_robot_sprite(robot, robot.last, animation_pos)
         if robot_sprite != None:
             robot_sprites.append(robot_sprite)
     return robot_sprites
@@ -179,24 +182,22 @@ def lerp(start, end, t):
     return start * (1-t) + end * t
 
 
-def draw_state(state, winner_time, available_robots, window, last_robots=None, animation_pos=1):
+def draw_state(state, winner_time, available_robots, window, animation_pos=None):
     """
     Draw the images of tiles and robots into map, react to user's resizing of window by scaling the board.
 
     state: State object containing game board, robots and map sizes.
     Winner_time is the time, when client received message about winner.
 
-    If "last_robots" is given, display a frame of the animation between
-    the state given in "last_robots" and the one in "state".
+    If "animation_pos" is given, display a frame of the animation between
+    robots' positions before the last update ("robot.last",
+    see client_state.RobotView) and the current ones.
     The state of the animation is given by "animation_pos", which should be
-    between 0 (for "last_robots", the start of the animation) and 1 (for
+    between 0 (for "robot.last", the start of the animation) and 1 (for
     "state", the end of the animation).
-    The "last_robots" argument should be a dict of {robot name: robot}.
     """
-    if last_robots == None:
-        last_robots = {}
     tile_sprites = load_tiles(state)
-    robot_sprites = load_robots(state, last_robots, animation_pos)
+    robot_sprites = load_robots(state, animation_pos)
     tile_sprites.extend(robot_sprites)
 
     with window_zoom(
@@ -3,7 +3,12 @@ The game module
     - coordinate everything and run the game
     - call pyglet window, various backend and frontend functions
     - choose standard or other map to be loaded
+
+Robots play with random cards, one round every 3 seconds.
+For playing many games without graphic output use simulator.py.
 """
+from time import monotonic
+
 import pyglet
 import sys
 
@@ -13,7 +18,7 @@ from frontend import create_window, draw_state
 
 # load JSON map data from the backend module
 if len(sys.argv) == 1:
-    map_name = "maps/test_effects.json"
+    map_name = "maps/belt_map.json"
 
 # if other map should be loaded, use extra argument "maps/MAP_NAME.json"
 # when calling game.py by Python
@@ -23,33 +28,37 @@ else:
 
 # Get start state of the game from the backend module.
 state = State.get_start_state(map_name)
+# Time when the winner was found, 0 while nobody has won.
+winner_time = 0
 
-# Load pyglet graphic window from the frontend module.
-window = create_window(state)
 
-
-@window.event
 def on_draw():
     """
     Draw the game state (board and robots).
     """
-
     window.clear()
-    draw_state(state, window)
+    draw_state(state, winner_time, [], window)
 
 
-def move_once(t):
+# Load pyglet graphic window from the frontend module.
+window = create_window(state, on_draw)
+
+
+def play_round(t):
     """
-    Move all robots according to mock cards on hand and perform tile effects.
+    Play one round with random cards: apply card and tile effects.
     """
-
-    state.apply_all_effects()
-    print("After tile effects:")
+    global winner_time
+    state.play_round()
+    print("After round {}:".format(state.game_round - 1))
     for robot in state.robots:
         print(robot)
+    if state.winners:
+        winner_time = monotonic()
+        pyglet.clock.unschedule(play_round)
 
 
-pyglet.clock.schedule_once(move_once, 3)
+pyglet.clock.schedule_interval(play_round, 3)
 
 # Run the pyglet library.
 pyglet.app.run()
@@ -0,0 +1,414 @@
+"""
+Grid contains the compiled form of the game board used by the game logic.
+"""
+
+from collections import deque
+
+from util_backend import DELTAS, DIRECTIONS, get_next_coordinates
+from tile import FlagTile, HoleTile, LaserTile
+
+
+# Tiles returned for every coordinates out of the game board.
+# One shared tuple is used instead of creating a new HoleTile on every lookup.
+OFF_BOARD_TILES = (HoleTile(),)
+
+
+class Grid:
+    """
+    Game board stored in flat lists indexed by integer cell id.
+
+    Cell id of coordinates (x, y) is y * width + x.
+    The board dictionary returned by loading.get_board() stays available
+    for the frontend and the validator, the game logic uses the grid.
+    Use get_grid() to get the grid shared by all states with the same board.
+    """
+    def __init__(self, board):
+        self.width, self.height = board.info.width, board.info.height
+        self.tiles = [OFF_BOARD_TILES] * (self.width * self.height)
+        for coordinates, tiles in board.items():
+            self.tiles[self.cell_id(coordinates)] = tuple(tiles)
+        # Neighbour table: neighbours[cell][direction.index] is the cell id
+        # of the neighbouring tile, None out of the board.
+        self.neighbours = [self.get_neighbours(cell) for cell in range(len(self.tiles))]
+        # Passability bitmasks, the bit of every direction is 1 << direction.index.
+        self.passable = [self.get_passable_mask(cell) for cell in range(len(self.tiles))]
+        self.sight = self.get_sight_distances()
+        # Successor tables of conveyor belts, see get_belt_table().
+        self.express_belts = self.get_belt_table(express_belts=True)
+        self.all_belts = self.get_belt_table(express_belts=False)
+        # Coordinates of tiles active in the register phases.
+        # Pushers are split by their register property:
+        # pusher_cells[0] for even register number, pusher_cells[1] for odd.
+        self.pusher_cells = (set(), set())
+        self.gear_cells = set()
+        self.laser_cells = set()
+        self.checkpoint_cells = set()
+        for cell, tiles in enumerate(self.tiles):
+            for tile in tiles:
+                self.add_phase_cell(self.coordinates(cell), tile)
+        self.laser_beams = self.get_laser_beams()
+        # Dictionary {(cell, laser direction): (beam, position in beam)}
+        self.laser_positions = {}
+        for beam in self.laser_beams:
+            for position, coordinates in enumerate(beam.cells):
+                self.laser_positions[self.cell_id(coordinates), beam.direction] = beam, position
+        # Distance fields to flags are computed when they are needed first,
+        # see get_flag_distances().
+        self._flag_distances = None
+
+    def __repr__(self):
+        return "<Grid {}x{}>".format(self.width, self.height)
+
+    def cell_id(self, coordinates):
+        """
+        Return cell id of the given coordinates.
+        If coordinates are out of the board, return None.
+        """
+        x, y = coordinates
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def coordinates(self, cell):
+        """
+        Return coordinates of the given cell id.
+        """
+        return cell % self.width, cell // self.width
+
+    def get_neighbours(self, cell):
+        """
+        Return tuple of cell ids of the neighbouring tiles by direction index,
+        None for the directions out of the board.
+        """
+        x, y = self.coordinates(cell)
+        return tuple(self.cell_id((x + dx, y + dy)) for dx, dy in DELTAS)
+
+    def get_tiles(self, coordinates):
+        """
+        Get tiles on requested coordinates.
+
+        coordinates: tuple of x and y coordinate
+        Return a tuple of tiles or a hole tile if coordinates are out of the board.
+        """
+        x, y = coordinates
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.tiles[y * self.width + x]
+        return OFF_BOARD_TILES
+
+    def get_passable_mask(self, cell):
+        """
+        Return bitmask of directions in which a robot can leave the cell.
+
+        Walls on both sides of the edge are folded together:
+        the bit is set only when neither the wall on this cell nor the wall
+        on the neighbouring cell blocks the move.
+        """
+        mask = 0
+        for direction in DIRECTIONS:
+            next_cell = self.neighbours[cell][direction.index]
+            if next_cell is None:
+                next_tiles = OFF_BOARD_TILES
+            else:
+                next_tiles = self.tiles[next_cell]
+            if check_tiles_passable(self.tiles[cell], next_tiles, direction):
+                mask |= 1 << direction.index
+        return mask
+
+    def can_move(self, coordinates, direction):
+        """
+        Check the absence of a wall in the direction of the move.
+
+        Return a boolean.
+        True - There isn't wall, robot can move.
+        False - There is wall, robot can't move.
+        """
+        x, y = coordinates
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.passable[y * self.width + x] >> direction.index & 1 == 1
+        # Coordinates out of the board aren't compiled, check the tiles.
+        next_coordinates = get_next_coordinates(coordinates, direction)
+        return check_tiles_passable(OFF_BOARD_TILES, self.get_tiles(next_coordinates), direction)
+
+    def get_sight_distances(self):
+        """
+        Return a list of distances to the nearest wall or board edge,
+        4 values (one for every direction) for every cell.
+
+        The distance is the count of tiles a laser can pass from the cell
+        in the given direction. The value for cell and direction
+        is at index cell * 4 + direction index.
+        """
+        sight = [0] * (len(self.tiles) * 4)
+        for direction in DIRECTIONS:
+            index = direction.index
+            bit = 1 << index
+            dx, dy = DELTAS[index]
+            # Go from the board edge the direction points to,
+            # so the distance of the next cell is always known.
+            xs = range(self.width - 1, -1, -1) if dx > 0 else range(self.width)
+            ys = range(self.height - 1, -1, -1) if dy > 0 else range(self.height)
+            for y in ys:
+                for x in xs:
+                    cell = y * self.width + x
+                    next_cell = self.neighbours[cell][index]
+                    if next_cell is not None and self.passable[cell] & bit:
+                        sight[cell * 4 + index] = sight[next_cell * 4 + index] + 1
+        return sight
+
+    def get_sight(self, coordinates, direction):
+        """
+        Return the count of tiles a laser can pass from the coordinates
+        in the given direction before it hits a wall or the board edge.
+        """
+        return self.sight[self.cell_id(coordinates) * 4 + direction.index]
+
+    def add_phase_cell(self, coordinates, tile):
+        """
+        Add coordinates to the set of the register phase the tile takes part in.
+        """
+        if tile.type == "pusher":
+            self.pusher_cells[tile.register].add(coordinates)
+        elif tile.type == "gear":
+            self.gear_cells.add(coordinates)
+        elif tile.type == "laser":
+            self.laser_cells.add(coordinates)
+        elif tile.type in ("flag", "repair"):
+            self.checkpoint_cells.add(coordinates)
+
+    def get_belt_table(self, express_belts):
+        """
+        Return successor table of conveyor belts of desired type.
+
+        express_belts: a boolean, True - for express belts, False - for all belts.
+        Return a dictionary {coordinates: (next coordinates, rotations)}
+        for every belt which can move a robot (there is no wall in the way).
+        Rotations is a tuple of rotations applied to the robot
+        when he enters the next tile.
+        """
+        belts = {}
+        for cell, tiles in enumerate(self.tiles):
+            coordinates = self.coordinates(cell)
+            for tile in tiles:
+                if tile.check_belts(express_belts):
+                    belt_direction = tile.get_belt_direction()
+                    if self.can_move(coordinates, belt_direction):
+                        next_coordinates = get_next_coordinates(coordinates, belt_direction)
+                        rotations = []
+                        for next_tile in self.get_tiles(next_coordinates):
+                            rotation = next_tile.get_belt_rotation(belt_direction)
+                            if rotation is not None:
+                                rotations.append(rotation)
+                        belts[coordinates] = next_coordinates, tuple(rotations)
+                        break
+        return belts
+
+    def get_laser_beams(self):
+        """
+        Return a list of all laser beams on the board.
+
+        Every beam starts on a laser start tile and continues in laser's
+        direction over the following laser tiles of the same direction.
+        """
+        beams = []
+        for cell, tiles in enumerate(self.tiles):
+            for tile in tiles:
+                if isinstance(tile, LaserTile) and tile.start:
+                    beams.append(self.trace_laser_beam(self.coordinates(cell), tile))
+        return beams
+
+    def trace_laser_beam(self, start, start_tile):
+        """
+        Follow the laser from its start tile and return its beam.
+        """
+        cells = [start]
+        coordinates = start
+        while True:
+            coordinates = get_next_coordinates(coordinates, start_tile.direction)
+            for tile in self.get_tiles(coordinates):
+                if (isinstance(tile, LaserTile) and not tile.start
+                        and tile.direction == start_tile.direction):
+                    cells.append(coordinates)
+                    break
+            else:
+                # There is no follow-up laser tile, the beam ends.
+                return LaserBeam(start, start_tile.direction, start_tile.laser_strength, cells)
+
+    def get_laser_beam(self, coordinates, direction):
+        """
+        Return the laser beam of given direction going through coordinates
+        and the position of the coordinates in the beam (0 is the start).
+        If there is no such beam, return None and None.
+        """
+        return self.laser_positions.get((self.cell_id(coordinates), direction), (None, None))
+
+    def is_deadly(self, coordinates):
+        """
+        Check if robot dies on the coordinates (there is a hole
+        or the coordinates are out of the board).
+        """
+        return any(isinstance(tile, HoleTile) for tile in self.get_tiles(coordinates))
+
+    def convey(self, coordinates):
+        """
+        Return coordinates where belts carry a robot standing on the coordinates
+        at the end of the register: express belts first, then all belts.
+        Return None if the robot falls into a hole.
+
+        Other robots standing in the way aren't taken into account.
+        """
+        for belts in self.express_belts, self.all_belts:
+            belt = belts.get(coordinates)
+            if belt is not None:
+                coordinates = belt[0]
+                if self.is_deadly(coordinates):
+                    return None
+        return coordinates
+
+    def get_moves(self, coordinates):
+        """
+        Return set of coordinates a robot can get to from the coordinates
+        in one register: he steps to one of the neighbouring tiles
+        (there mustn't be a wall or a hole) or stays, and then belts carry him.
+        """
+        moves = set()
+        for direction in DIRECTIONS:
+            if self.can_move(coordinates, direction):
+                next_coordinates = get_next_coordinates(coordinates, direction)
+                if not self.is_deadly(next_coordinates):
+                    moves.add(self.convey(next_coordinates))
+        moves.add(self.convey(coordinates))
+        moves.discard(None)
+        moves.discard(coordinates)
+        return moves
+
+    def get_flag_distances(self):
+        """
+        Return distance fields to all flags on the board.
+
+        Return a dictionary {flag number: list of distances}, the list has
+        the count of registers (see get_moves()) a robot needs to get from
+        the cell to the flag at index of the cell id. None means the robot
+        can't get to the flag from the cell.
+
+        The fields are computed by breadth-first search from every flag
+        over the moves in reverse, only once for the grid.
+        """
+        if self._flag_distances is None:
+            # Reversed moves: {coordinates: list of coordinates robot can come from}
+            previous_cells = {}
+            for cell, tiles in enumerate(self.tiles):
+                coordinates = self.coordinates(cell)
+                if self.is_deadly(coordinates):
+                    continue
+                for next_coordinates in self.get_moves(coordinates):
+                    previous_cells.setdefault(next_coordinates, []).append(coordinates)
+
+            self._flag_distances = {}
+            for cell, tiles in enumerate(self.tiles):
+                for tile in tiles:
+                    if isinstance(tile, FlagTile):
+                        self._flag_distances[tile.number] = self.get_distance_field(
+                            self.coordinates(cell), previous_cells)
+        return self._flag_distances
+
+    def get_distance_field(self, target, previous_cells):
+        """
+        Return list of distances from every cell to the target coordinates.
+
+        previous_cells: reversed moves created in get_flag_distances()
+        """
+        distances = [None] * len(self.tiles)
+        distances[self.cell_id(target)] = 0
+        queue = deque([target])
+        while queue:
+            coordinates = queue.popleft()
+            distance = distances[self.cell_id(coordinates)] + 1
+            for previous_coordinates in previous_cells.get(coordinates, []):
+                previous_cell = self.cell_id(previous_coordinates)
+                if distances[previous_cell] is None:
+                    distances[previous_cell] = distance
+                    queue.append(previous_coordinates)
+        return distances
+
+    def get_flag_distance(self, coordinates, flag_number):
+        """
+        Return count of registers a robot needs to get from the coordinates
+        to the flag with the given number.
+        Return None if he can't get there or there is no such flag.
+        """
+        distances = self.get_flag_distances().get(flag_number)
+        cell = self.cell_id(coordinates)
+        if distances is None or cell is None:
+            return None
+        return distances[cell]
+
+
+class LaserBeam:
+    """
+    Laser beam of the board lasers.
+
+    start: coordinates of the laser start tile
+    direction: direction in which the laser shoots
+    strength: count of damages the laser gives
+    cells: list of coordinates the beam goes through, from the start
+    """
+    def __init__(self, start, direction, strength, cells):
+        self.start = start
+        self.direction = direction
+        self.strength = strength
+        self.cells = cells
+        self.positions = {coordinates: position for position, coordinates in enumerate(cells)}
+
+    def __repr__(self):
+        return "<LaserBeam {} {} {} {}>".format(
+            self.start, self.direction, self.strength, len(self.cells))
+
+    def is_blocked(self, position, occupancy):
+        """
+        Check if a robot stands on the beam between its start
+        and the given position (the start included, the position not).
+
+        occupancy: dictionary of robots' coordinates (State.occupancy)
+        """
+        if len(occupancy) < position:
+            # There are fewer robots than the cells to check.
+            for coordinates in occupancy:
+                robot_position = self.positions.get(coordinates)
+                if robot_position is not None and robot_position < position:
+                    return True
+            return False
+        for coordinates in self.cells[:position]:
+            if coordinates in occupancy:
+                return True
+        return False
+
+
+def check_tiles_passable(old_tiles, new_tiles, direction):
+    """
+    Check the absence of a wall between two neighbouring lists of tiles.
+
+    old_tiles: tiles robot moves from
+    new_tiles: tiles robot moves to
+    direction: object of Direction class
+    """
+    # Current tile: Check wall in the direction of next move.
+    for tile in old_tiles:
+        if not tile.can_move_from(direction):
+            return False
+    # Next tile: Check wall in the direction of the move.
+    for tile in new_tiles:
+        if not tile.can_move_to(direction):
+            return False
+    return True
+
+
+def get_grid(board):
+    """
+    Return grid of the board (loading.Board).
+
+    The grid is created only once and kept with the board,
+    so states playing on the same board share it.
+    """
+    if board.grid is None:
+        board.grid = Grid(board)
+    return board.grid
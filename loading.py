@@ -2,11 +2,89 @@
 Loading module contains functions to load map file exported to json format from Tiled 1.2.
 """
 import json
+from collections import OrderedDict
+from functools import lru_cache
 
 from util_backend import Direction
 from tile import create_tile_subclass
 
 
+class Board(dict):
+    """
+    Game board - dictionary {coordinates: tuple of tiles} created by board_from_data().
+
+    The board is shared by all states on the same map (see get_board()),
+    so it is read-only: its tiles are in tuples and setting or deleting
+    items raises TypeError.
+
+    info: MapInfo computed when the board is loaded
+    grid: compiled form of the board, see grid.get_grid()
+    """
+    def __init__(self, tiles, info):
+        super().__init__(tiles)
+        self.info = info
+        self.grid = None
+
+    def read_only(self, *args, **kwargs):
+        raise TypeError("Board can't be changed, it is shared by all states on the map.")
+
+    __setitem__ = __delitem__ = read_only
+    clear = pop = popitem = setdefault = update = read_only
+
+
+class MapInfo:
+    """
+    Information about the map computed once when the map is loaded,
+    so it isn't searched for on the board again.
+
+    width, height: count of tiles in horizontal (x) and vertical (y) ax
+    flags: dictionary {flag number: coordinates}
+    start_tiles: dictionary {start tile number: {"coordinates": coordinates,
+    "tile_direction": direction}} ordered by the number
+    stop_tiles: the same dictionary for the stop tiles (only for tests)
+    tile_counts: dictionary {tile type: count of tiles of the type}
+    """
+    def __init__(self, width, height, flags, start_tiles, stop_tiles, tile_counts):
+        self.width = width
+        self.height = height
+        self.flags = flags
+        self.start_tiles = start_tiles
+        self.stop_tiles = stop_tiles
+        self.tile_counts = tile_counts
+
+    def __repr__(self):
+        return "<MapInfo {}x{} flags: {} starts: {}>".format(
+            self.width, self.height, self.flag_count, len(self.start_tiles))
+
+    @property
+    def flag_count(self):
+        """
+        Return number of flags on the map.
+        """
+        return self.tile_counts.get("flag", 0)
+
+
+def get_map_info(board, width, height):
+    """
+    Return MapInfo of the board with the given size.
+    """
+    flags = {}
+    initial_tiles = {"start": {}, "stop": {}}
+    tile_counts = {}
+    for coordinates, tiles in board.items():
+        for tile in tiles:
+            tile_counts[tile.type] = tile_counts.get(tile.type, 0) + 1
+            if tile.type == "flag":
+                flags[tile.number] = coordinates
+            if tile.type in initial_tiles:
+                initial_tiles[tile.type][tile.number] = {
+                    "coordinates": coordinates, "tile_direction": tile.direction}
+    # Sort initial tiles by their numbers.
+    start_tiles, stop_tiles = (OrderedDict(sorted(initial_tiles[tile_type].items()))
+                               for tile_type in ("start", "stop"))
+    return MapInfo(width, height, flags, start_tiles, stop_tiles, tile_counts)
+
+
 def get_map_data(map_name):
     """
     Return a dictionary of decoded JSON map file.
@@ -136,10 +214,11 @@ def board_from_data(map_data):
     """
     Create game board.
 
-    Return dictionary of coordinates containing matching Tile objects.
+    Return Board - dictionary of coordinates containing matching Tile objects
+    with MapInfo of the map.
 
-    Create a board in format {(11, 0): [Tile, Tile, Tile], (11, 1): [Tile]...}.
-    Tile object is created for every matching coordinates.
+    Create a board in format {(11, 0): (Tile, Tile, Tile), (11, 1): (Tile,)...}.
+    The same Tile object is used for all coordinates with the same tile.
     For "empty" coordinates (not containing tiles) no objects are created.
     Tile object can appear many times on the same coordinates if the map contains more layers.
     Basic idea about dict comprehension used to create board can be found here:
@@ -150,28 +229,36 @@ def board_from_data(map_data):
 
     # create dictionary of coordinates where value is empty list for further transformation
     board = {coordinate: [] for coordinate in coordinates}
+    # Tile objects are shared, remember the one created for every tile number.
+    created_tiles = {}
     for layer in map_data['layers']:
 
         # make tuple containing tile data and matching coordinates
         for tile_number, coordinate in zip(layer['data'], coordinates):
-            id = get_tile_id(tile_number)
-            tiles = board[coordinate]
-
-            # if id == 0 there is empty space here, ergo don't create Tile object
+            # if tile_number == 0 there is empty space here, ergo don't create Tile object
             # otherwise add Tile object to the list of objects on the same coordinates
-            if id != 0:
-                direction = get_tile_direction(tile_number)
-                tile = create_tile_subclass(direction, names[id], types[id], properties[id])
-                tiles.append(tile)
-                board[coordinate] = tiles
-    return board
-
-
+            if tile_number != 0:
+                tile = created_tiles.get(tile_number)
+                if tile is None:
+                    id = get_tile_id(tile_number)
+                    direction = get_tile_direction(tile_number)
+                    tile = create_tile_subclass(direction, names[id], types[id], properties[id])
+                    created_tiles[tile_number] = tile
+                board[coordinate].append(tile)
+    info = get_map_info(board, map_data["width"], map_data["height"])
+    return Board({coordinate: tuple(tiles) for coordinate, tiles in board.items()}, info)
+
+
+@lru_cache(maxsize=100)
 def get_board(map_name):
     """
     Create game board from provided data from JSON file.
 
     map_name: a map of the game board created in Tiled 1.2 and saved as a JSON file
+    The map is loaded only once, the same read-only board (with its MapInfo
+    and Grid) is returned for the same map name.
+    More info about lru_cache decorator:
+    https://docs.python.org/3/library/functools.html#functools.lru_cache
     """
     map_data = get_map_data(map_name)
     return board_from_data(map_data)
@@ -0,0 +1,695 @@
+"""
+Lockstep engine plays many games on the same map at once.
+
+Robots of all games are stored in NumPy arrays - one array for every
+robot's attribute with a row for every game and a column for every robot.
+The rules of backend.State are applied to all games together,
+so thousands of games can be played for statistics and training of bots.
+
+The engine follows State.apply_all_effects() step by step,
+tests/test_lockstep.py compares both on the test maps and on random games.
+Cards are given as arrays of programs (see LockstepGames.set_programs)
+or dealt randomly from the whole pack in every round
+(see LockstepGames.deal_random_programs).
+"""
+import numpy
+
+from backend import State, MovementCard, MAX_CARD_COUNT, MAX_DAMAGE_VALUE, create_cards
+from tile import FlagTile, GearTile, HoleTile, LaserTile, PusherTile, RepairTile
+from util_backend import DIRECTIONS, get_next_coordinates
+
+
+# Directions are stored in arrays by their index (see util_backend.DIRECTIONS).
+U_TURN = 2
+
+# Kinds of cards in program arrays.
+NO_CARD = 0
+MOVEMENT_CARD = 1
+ROTATION_CARD = 2
+
+REGISTERS = 5
+
+
+class DifferentMapError(Exception):
+    """Raised when lockstep games should be created from states with different maps."""
+
+
+def get_rotation_steps(rotation):
+    """
+    Return rotation as count of 90° steps to the right (-1 for left).
+    """
+    return rotation.value // 90
+
+
+class LockstepBoard:
+    """
+    Game board compiled to NumPy arrays indexed by cell id.
+
+    The board is surrounded by a frame of cells out of the board,
+    robots die there like in holes. Cell id of coordinates (x, y)
+    is (y + 1) * (width + 2) + x + 1. The last cell id (nowhere)
+    is a cell where nobody ever stands: inactive robots have it
+    as their cell and it fills the gaps in lists of cells.
+    """
+    def __init__(self, grid):
+        self.grid = grid
+        self.width = grid.width + 2
+        self.height = grid.height + 2
+        self.nowhere = self.width * self.height
+        size = self.nowhere + 1
+        self.coordinates = [self.get_coordinates(cell) for cell in range(self.nowhere)]
+
+        # Bitmask of directions a robot can leave the cell in (see Grid.passable).
+        self.passable = numpy.zeros(size, dtype=int)
+        self.neighbours = numpy.full((size, 4), self.nowhere)
+        self.holes = numpy.ones(size, dtype=bool)
+        self.holes[self.nowhere] = False
+        # Gear rotations, count of repair tiles
+        # and cells where robots get new start coordinates.
+        self.gear_turns = numpy.zeros(size, dtype=int)
+        self.repairs = numpy.zeros(size, dtype=int)
+        self.new_starts = numpy.zeros(size, dtype=bool)
+        # Conveyor belts: [express belts, all belts], -1 where there is no belt.
+        self.belt_targets = numpy.full((2, size), -1)
+        self.belt_turns = numpy.zeros((2, size), dtype=int)
+
+        pushers = ([], [])
+        lasers = []
+        flags = []
+        for cell in range(self.nowhere):
+            coordinates = self.coordinates[cell]
+            grid_cell = grid.cell_id(coordinates)
+            if grid_cell is None:
+                continue
+            self.passable[cell] = grid.passable[grid_cell]
+            for index, direction in enumerate(DIRECTIONS):
+                self.neighbours[cell, index] = self.cell_id(
+                    get_next_coordinates(coordinates, direction))
+            tiles = grid.tiles[grid_cell]
+            self.holes[cell] = any(isinstance(tile, HoleTile) for tile in tiles)
+            for tile in tiles:
+                if isinstance(tile, PusherTile):
+                    pushers[tile.register].append(
+                        (cell, (tile.direction.index + U_TURN) % 4))
+                elif isinstance(tile, GearTile):
+                    self.gear_turns[cell] += get_rotation_steps(tile.move_direction)
+                elif isinstance(tile, LaserTile):
+                    lasers.append((cell, self.get_laser_blockers(coordinates, tile)))
+                elif isinstance(tile, FlagTile):
+                    flags.append((cell, tile.number))
+                    self.new_starts[cell] = True
+                elif isinstance(tile, RepairTile):
+                    self.repairs[cell] += 1
+                    if tile.new_start:
+                        self.new_starts[cell] = True
+        for index, belts in enumerate((grid.express_belts, grid.all_belts)):
+            for coordinates, (next_coordinates, rotations) in belts.items():
+                cell = self.cell_id(coordinates)
+                self.belt_targets[index, cell] = self.cell_id(next_coordinates)
+                self.belt_turns[index, cell] = sum(
+                    get_rotation_steps(rotation) for rotation in rotations)
+
+        # Tiles which can be more than once on one cell are stored
+        # in arrays [cell, tile index], in order of tiles on the cell.
+        # Pushers: [pushers with register 0, pushers with register 1],
+        # direction index of the push or -1.
+        self.pushers = [self.get_cell_table(cells, -1) for cells in pushers]
+        self.laser_strengths = self.get_cell_table(
+            [(cell, strength) for cell, (strength, blockers) in lasers], 0)
+        # Lists of cells which block the laser for robot on the laser tile,
+        # [cell, tile index, position], padded with nowhere.
+        blockers_length = max((len(blockers) for cell, (strength, blockers) in lasers), default=0)
+        self.laser_blockers = numpy.full(
+            self.laser_strengths.shape + (max(blockers_length, 1),), self.nowhere)
+        positions = {}
+        for cell, (strength, blockers) in lasers:
+            index = positions.get(cell, 0)
+            positions[cell] = index + 1
+            self.laser_blockers[cell, index, :len(blockers)] = blockers
+        self.flag_numbers = self.get_cell_table(flags, 0)
+        self.flag_count = len(flags)
+        self.rays = self.get_robot_laser_rays()
+
+    def __repr__(self):
+        return "<LockstepBoard {}x{}>".format(self.grid.width, self.grid.height)
+
+    def cell_id(self, coordinates):
+        """
+        Return cell id of coordinates on the board or in the frame around it.
+        """
+        x, y = coordinates
+        return (y + 1) * self.width + x + 1
+
+    def get_coordinates(self, cell):
+        """
+        Return coordinates of the cell id.
+        """
+        return cell % self.width - 1, cell // self.width - 1
+
+    def get_cell_table(self, values, empty):
+        """
+        Return array [cell, index] of values given as list of (cell, value),
+        values of one cell are stored in order of the list.
+        """
+        counts = {}
+        for cell, value in values:
+            counts[cell] = counts.get(cell, 0) + 1
+        table = numpy.full((self.nowhere + 1, max(counts.values(), default=1)), empty)
+        positions = {}
+        for cell, value in values:
+            index = positions.get(cell, 0)
+            positions[cell] = index + 1
+            table[cell, index] = value
+        return table
+
+    def get_laser_blockers(self, coordinates, tile):
+        """
+        Return laser strength and list of cells where robots stop the laser
+        before it reaches the coordinates (see LaserTile.shoot_robot).
+        """
+        if tile.start:
+            return tile.laser_strength, []
+        beam, position = self.grid.get_laser_beam(coordinates, tile.direction)
+        if beam is None:
+            return tile.laser_strength, []
+        return tile.laser_strength, [self.cell_id(cell) for cell in beam.cells[:position]]
+
+    def get_robot_laser_rays(self):
+        """
+        Return array [cell, direction index, distance] of cells the robot laser
+        passes from the cell, padded with nowhere (see Grid.get_sight).
+        """
+        length = max(self.grid.width, self.grid.height)
+        rays = numpy.full((self.nowhere + 1, 4, length), self.nowhere)
+        for cell in range(self.nowhere):
+            coordinates = self.coordinates[cell]
+            if self.grid.cell_id(coordinates) is None:
+                continue
+            for index, direction in enumerate(DIRECTIONS):
+                ray_coordinates = coordinates
+                for distance in range(self.grid.get_sight(coordinates, direction)):
+                    ray_coordinates = get_next_coordinates(ray_coordinates, direction)
+                    rays[cell, index, distance] = self.cell_id(ray_coordinates)
+        return rays
+
+
+class LockstepGames:
+    """
+    Many games on the same map played together.
+
+    states: list of States (with the same map) the games start from,
+    robots' attributes and the start tiles are copied from them.
+    All states must have the same count of robots.
+
+    Robot attributes are arrays [game, robot]. Robots removed from the game
+    (see State.set_robots_for_new_turn) have False in the present array.
+    """
+    def __init__(self, states):
+        first_state = states[0]
+        for state in states:
+            if state.grid is not first_state.grid and state.grid.tiles != first_state.grid.tiles:
+                raise DifferentMapError()
+        self.board = LockstepBoard(first_state.grid)
+        board = self.board
+        self.games_count = len(states)
+        self.robots_count = len(first_state.robots)
+        self.games = numpy.arange(self.games_count)
+        self.game_round = first_state.game_round
+        self.flag_count = first_state.flag_count
+
+        shape = self.games_count, self.robots_count
+        self.cells = numpy.full(shape, board.nowhere)
+        self.directions = numpy.zeros(shape, dtype=int)
+        self.lives = numpy.zeros(shape, dtype=int)
+        self.flags = numpy.zeros(shape, dtype=int)
+        self.damages = numpy.zeros(shape, dtype=int)
+        self.permanent_damages = numpy.zeros(shape, dtype=int)
+        self.power_down = numpy.zeros(shape, dtype=bool)
+        self.winner = numpy.zeros(shape, dtype=bool)
+        self.present = numpy.ones(shape, dtype=bool)
+        # Round in which somebody won the game, 0 if nobody has won.
+        self.won_round = numpy.zeros(self.games_count, dtype=int)
+        # Robot which stands on the cell, -1 for no robot.
+        self.occupancy = numpy.full((self.games_count, board.nowhere + 1), -1)
+
+        # Start coordinates: cells where robots can restart,
+        # start_times [game, robot, start] tell when the robot got the start
+        # (see Robot.add_start_coordinates), -1 if he hasn't got it.
+        self.start_tiles = [board.cell_id(coordinates)
+                            for coordinates in first_state.start_coordinates]
+        starts = set(self.start_tiles)
+        starts.update(numpy.flatnonzero(board.new_starts).tolist())
+        for state in states:
+            for robot in state.robots:
+                starts.update(board.cell_id(coordinates)
+                              for coordinates in robot.start_coordinates)
+        self.starts = numpy.array(sorted(starts))
+        self.start_indexes = numpy.full(board.nowhere + 1, -1)
+        self.start_indexes[self.starts] = numpy.arange(len(self.starts))
+        self.start_times = numpy.full(shape + (len(self.starts),), -1)
+        self.clock = 0
+
+        self.program_kinds = numpy.zeros(shape + (REGISTERS,), dtype=int)
+        self.program_values = numpy.zeros(shape + (REGISTERS,), dtype=int)
+        self.program_priorities = numpy.zeros(shape + (REGISTERS,), dtype=int)
+        # Whole pack of cards for dealing random programs.
+        pack = create_cards()
+        self.pack_kinds, self.pack_values, self.pack_priorities = (
+            numpy.array(values) for values in zip(*(get_card_values(card) for card in pack)))
+
+        for game, state in enumerate(states):
+            if len(state.robots) != self.robots_count:
+                raise ValueError("All states must have the same count of robots.")
+            for index, robot in enumerate(state.robots):
+                self.load_robot(game, index, robot)
+        self.set_programs(states)
+
+    def __repr__(self):
+        return "<LockstepGames {} games {} robots {}>".format(
+            self.games_count, self.robots_count, self.board)
+
+    @classmethod
+    def get_start_games(cls, map_name, games, players=None):
+        """
+        Get start state of the given count of games on the map.
+        """
+        state = State.get_start_state(map_name, players)
+        return cls([state] * games)
+
+    def load_robot(self, game, index, robot):
+        """
+        Copy robot's attributes to the arrays.
+        """
+        if robot.coordinates is not None:
+            cell = self.board.cell_id(robot.coordinates)
+            self.cells[game, index] = cell
+            self.occupancy[game, cell] = index
+        self.directions[game, index] = robot.direction.index
+        self.lives[game, index] = robot.lives
+        self.flags[game, index] = robot.flags
+        self.damages[game, index] = robot.damages
+        self.permanent_damages[game, index] = robot.permanent_damages
+        self.power_down[game, index] = robot.power_down
+        self.winner[game, index] = robot.winner
+        for coordinates in robot.start_coordinates:
+            start = self.start_indexes[self.board.cell_id(coordinates)]
+            self.start_times[game, index, start] = self.clock
+            self.clock += 1
+
+    def set_programs(self, states):
+        """
+        Copy robots' programs from the states (one for every game).
+        Robots removed from the game must be removed from the state as well.
+        """
+        for game, state in enumerate(states):
+            indexes = numpy.flatnonzero(self.present[game])
+            for index, robot in zip(indexes, state.robots):
+                for register, card in enumerate(robot.program):
+                    (self.program_kinds[game, index, register],
+                     self.program_values[game, index, register],
+                     self.program_priorities[game, index, register]) = get_card_values(card)
+
+    def get_robots(self, game):
+        """
+        Return list of dictionaries of robots' attributes in the game
+        (with the same values as Robot's attributes).
+        Only robots present in the game are returned.
+        """
+        robots = []
+        for index in range(self.robots_count):
+            if not self.present[game, index]:
+                continue
+            cell = self.cells[game, index]
+            times = self.start_times[game, index]
+            started = [start for start in numpy.argsort(times, kind="stable")
+                       if times[start] >= 0]
+            robots.append({
+                "index": index,
+                "coordinates": None if cell == self.board.nowhere else self.board.coordinates[cell],
+                "direction": DIRECTIONS[self.directions[game, index]],
+                "lives": int(self.lives[game, index]),
+                "flags": int(self.flags[game, index]),
+                "damages": int(self.damages[game, index]),
+                "permanent_damages": int(self.permanent_damages[game, index]),
+                "power_down": bool(self.power_down[game, index]),
+                "winner": bool(self.winner[game, index]),
+                "start_coordinates": [self.board.coordinates[self.starts[start]]
+                                      for start in started],
+            })
+        return robots
+
+    def is_active(self, games, robots):
+        """
+        Return array telling which of the robots stand on the board.
+        """
+        return self.cells[games, robots] != self.board.nowhere
+
+    def deal_random_programs(self, random):
+        """
+        Fill unblocked registers of all robots with random cards.
+
+        random: numpy.random.Generator
+        Every game gets a new shuffled pack every round,
+        robot gets 9 following cards and programs the unblocked ones.
+        """
+        if self.robots_count * MAX_CARD_COUNT > len(self.pack_kinds):
+            raise ValueError("There are not enough cards for all robots.")
+        order = random.permuted(
+            numpy.tile(numpy.arange(len(self.pack_kinds)), (self.games_count, 1)), axis=1)
+        unblocked = self.get_unblocked_cards()
+        for register in range(REGISTERS):
+            cards = order[:, register:self.robots_count * MAX_CARD_COUNT:MAX_CARD_COUNT]
+            dealt = unblocked > register
+            self.program_kinds[:, :, register][dealt] = self.pack_kinds[cards][dealt]
+            self.program_values[:, :, register][dealt] = self.pack_values[cards][dealt]
+            self.program_priorities[:, :, register][dealt] = self.pack_priorities[cards][dealt]
+
+    def get_unblocked_cards(self):
+        """
+        Return array of counts of robots' unblocked cards (see Robot.unblocked_cards).
+        """
+        damages = self.damages + self.permanent_damages
+        return numpy.where(damages > 4, MAX_CARD_COUNT - damages, 5)
+
+    def play_round(self, random):
+        """
+        Play one round in all games with random programs.
+
+        random: numpy.random.Generator
+        """
+        self.deal_random_programs(random)
+        self.damages[self.power_down] = 0
+        self.apply_all_effects()
+        self.check_winner()
+        self.game_round += 1
+        self.power_down[:] = False
+
+    def apply_all_effects(self, registers=REGISTERS):
+        """
+        Apply cards and tile effects of the given count of registers
+        and restart inactive robots (see State.apply_all_effects).
+        """
+        for register in range(registers):
+            self.apply_register(register)
+            self.apply_tile_effects(register)
+        self.set_robots_for_new_turn()
+
+    def apply_register(self, register):
+        """
+        Apply effects of the cards in the register in order of their priorities.
+
+        Games where some playing robot hasn't got a card skip the cards
+        (like State does on NoCardError).
+        """
+        kinds = self.program_kinds[:, :, register]
+        playing = self.present & (self.cells != self.board.nowhere) & ~self.power_down
+        has_cards = ~(playing & (kinds == NO_CARD)).any(axis=1)
+        priorities = numpy.where(playing, self.program_priorities[:, :, register], -1)
+        # Stable sort keeps order of robots with the same priority (like State).
+        order = numpy.argsort(-priorities, axis=1, kind="stable")
+        for rank in range(self.robots_count):
+            robots = order[:, rank]
+            games = self.games
+            selected = (playing[games, robots] & has_cards
+                        & self.is_active(games, robots))
+            games, robots = games[selected], robots[selected]
+            kinds = self.program_kinds[games, robots, register]
+            values = self.program_values[games, robots, register]
+
+            rotating = kinds == ROTATION_CARD
+            self.rotate(games[rotating], robots[rotating], values[rotating])
+
+            moving = kinds == MOVEMENT_CARD
+            games, robots, distances = games[moving], robots[moving], values[moving]
+            directions = self.directions[games, robots]
+            # Robot walking backwards walks 1 step in the opposite direction.
+            backwards = distances < 0
+            directions = numpy.where(backwards, (directions + U_TURN) % 4, directions)
+            distances = numpy.abs(distances)
+            self.walk(games, robots, directions, distances, push_others=True)
+
+    def rotate(self, games, robots, steps):
+        """
+        Rotate robots by count of 90° steps to the right.
+        """
+        self.directions[games, robots] = (self.directions[games, robots] + steps) % 4
+
+    def walk(self, games, robots, directions, distances, push_others):
+        """
+        Walk with robots (one robot in every game) step by step
+        (see Robot.walk). Walking robots can push other robots
+        if push_others is True, otherwise they stop before them.
+        """
+        board = self.board
+        for step in range(distances.max(initial=0)):
+            cells = self.cells[games, robots]
+            walking = ((distances > step) & (cells != board.nowhere)
+                       & (board.passable[cells] >> directions & 1 == 1))
+            games, robots, directions, distances, cells = (
+                games[walking], robots[walking], directions[walking],
+                distances[walking], cells[walking])
+            next_cells = board.neighbours[cells, directions]
+            others = self.occupancy[games, next_cells]
+            in_the_way = others >= 0
+            if push_others:
+                pushed = self.push(games[in_the_way], others[in_the_way], directions[in_the_way])
+                walking = numpy.ones(len(games), dtype=bool)
+                walking[in_the_way] = pushed
+            else:
+                walking = ~in_the_way
+            games, robots, directions, distances, next_cells = (
+                games[walking], robots[walking], directions[walking],
+                distances[walking], next_cells[walking])
+            self.move(games, robots, next_cells)
+
+    def push(self, games, robots, directions):
+        """
+        Push robots (one in every game) by one tile with the robots
+        in front of them. Return array telling in which games the robots moved.
+
+        The whole line of robots standing behind each other moves,
+        when there is no wall in front of the first robot of the line.
+        """
+        board = self.board
+        line = [robots]
+        blocked = numpy.zeros(len(games), dtype=bool)
+        last_robots = robots
+        continuing = numpy.ones(len(games), dtype=bool)
+        while continuing.any():
+            cells = self.cells[games, last_robots]
+            can_move = board.passable[cells] >> directions & 1 == 1
+            blocked |= continuing & ~can_move
+            next_robots = self.occupancy[games, board.neighbours[cells, directions]]
+            continuing &= can_move & (next_robots >= 0)
+            if continuing.any():
+                last_robots = numpy.where(continuing, next_robots, last_robots)
+                line.append(numpy.where(continuing, next_robots, -1))
+        # Move the first robots of the line first, so the others
+        # walk to free cells.
+        for robots in reversed(line):
+            moving = (robots >= 0) & ~blocked
+            moving_games, moving_robots = games[moving], robots[moving]
+            cells = self.cells[moving_games, moving_robots]
+            self.move(moving_games, moving_robots, board.neighbours[cells, directions[moving]])
+        return ~blocked
+
+    def move(self, games, robots, cells):
+        """
+        Move robots (one in every game) to the cells, robots in holes die.
+        """
+        self.occupancy[games, self.cells[games, robots]] = -1
+        self.occupancy[games, cells] = robots
+        self.cells[games, robots] = cells
+        in_hole = self.board.holes[cells]
+        self.die(games[in_hole], robots[in_hole])
+
+    def die(self, games, robots):
+        """
+        Robots lose life and leave the board (see Robot.die).
+        """
+        lives = self.lives[games, robots]
+        lives = numpy.where(lives > 0, lives - 1, lives)
+        self.lives[games, robots] = lives
+        self.permanent_damages[games, robots] += lives <= 0
+        self.occupancy[games, self.cells[games, robots]] = -1
+        self.cells[games, robots] = self.board.nowhere
+
+    def be_damaged(self, games, robots, strength):
+        """
+        Give damages to robots, robots with too many damages die
+        (see Robot.be_damaged).
+        """
+        permanent_damages = self.permanent_damages[games, robots]
+        max_damages = numpy.where(permanent_damages > 0,
+                                  MAX_DAMAGE_VALUE - permanent_damages, MAX_DAMAGE_VALUE)
+        damages = self.damages[games, robots]
+        surviving = damages < max_damages - strength
+        self.damages[games, robots] = numpy.where(surviving, damages + strength, damages)
+        self.die(games[~surviving], robots[~surviving])
+
+    def apply_tile_effects(self, register):
+        """
+        Apply effects of tiles and robots' lasers (see State.apply_tile_effects).
+        """
+        board = self.board
+        games = self.games
+        if (board.belt_targets[1] >= 0).any():
+            self.move_belts()
+
+        # Pushers active in this register.
+        pushers = board.pushers[(register + 1) % 2]
+        for robot in range(self.robots_count):
+            robots = numpy.full(self.games_count, robot)
+            cells = self.cells[:, robot]
+            for index in range(pushers.shape[1]):
+                directions = pushers[cells, index]
+                pushed = (directions >= 0) & self.present[:, robot] & self.is_active(games, robots)
+                self.walk(games[pushed], robots[pushed], directions[pushed],
+                          numpy.ones(pushed.sum(), dtype=int), push_others=False)
+
+        active = self.cells != board.nowhere
+        self.directions = numpy.where(
+            active, (self.directions + board.gear_turns[self.cells]) % 4, self.directions)
+
+        # Board lasers.
+        for robot in range(self.robots_count):
+            robots = numpy.full(self.games_count, robot)
+            cells = self.cells[:, robot]
+            for index in range(board.laser_strengths.shape[1]):
+                strengths = board.laser_strengths[cells, index]
+                shot = (strengths > 0) & self.is_active(games, robots)
+                blockers = board.laser_blockers[cells[shot], index]
+                blocked = (self.occupancy[games[shot][:, None], blockers] >= 0).any(axis=1)
+                shot[shot] = ~blocked
+                self.be_damaged(games[shot], robots[shot], strengths[shot])
+
+        # Robots' lasers, every robot shoots the nearest robot in his direction.
+        for robot in range(self.robots_count):
+            robots = numpy.full(self.games_count, robot)
+            shooting = self.is_active(games, robots) & ~self.power_down[:, robot]
+            shooting_games = games[shooting]
+            rays = board.rays[self.cells[shooting_games, robot],
+                              self.directions[shooting_games, robot]]
+            targets = self.occupancy[shooting_games[:, None], rays]
+            hit = (targets >= 0).any(axis=1)
+            nearest = numpy.argmax(targets >= 0, axis=1)
+            targets = targets[numpy.arange(len(targets)), nearest]
+            self.be_damaged(shooting_games[hit], targets[hit], 1)
+
+        # Collect flags and get new start coordinates.
+        for robot in range(self.robots_count):
+            cells = self.cells[:, robot]
+            for index in range(board.flag_numbers.shape[1]):
+                numbers = board.flag_numbers[cells, index]
+                collected = (numbers > 0) & (self.flags[:, robot] + 1 == numbers)
+                self.flags[collected, robot] += 1
+        active = self.cells != board.nowhere
+        new_start = active & board.new_starts[self.cells]
+        starting_games, starting_robots = numpy.nonzero(new_start)
+        self.start_times[
+            starting_games, starting_robots,
+            self.start_indexes[self.cells[starting_games, starting_robots]]] = self.clock
+        self.clock += 1
+
+    def move_belts(self):
+        """
+        Move robots on conveyor belts: first express belts, then all belts
+        (see State.move_belts).
+        """
+        board = self.board
+        games = self.games[:, None]
+        active = self.cells != board.nowhere
+        for belts in 0, 1:
+            cells = self.cells
+            belt_targets = board.belt_targets[belts, cells]
+            targets = numpy.where(active & (belt_targets >= 0), belt_targets, cells)
+
+            # Robots going to the same cell stay where they are,
+            # then they can collide with other robots, repeat it.
+            # (Robots are compared with each other, there are only a few of them.)
+            while True:
+                same_targets = ((targets[:, :, None] == targets[:, None, :])
+                                & active[:, :, None] & active[:, None, :])
+                counts = same_targets.sum(axis=2)
+                colliding = active & (targets != cells) & (counts > 1)
+                if not colliding.any():
+                    break
+                targets = numpy.where(colliding, cells, targets)
+
+            # Robots swapping their cells stay as well.
+            others = self.occupancy[games, targets]
+            moving = active & (targets != cells)
+            other_targets = numpy.take_along_axis(targets, numpy.maximum(others, 0), axis=1)
+            swapping = moving & (others >= 0) & (other_targets == cells)
+            moving &= ~swapping
+
+            moving_games, moving_robots = numpy.nonzero(moving)
+            old_cells = cells[moving_games, moving_robots]
+            new_cells = targets[moving_games, moving_robots]
+            self.rotate(moving_games, moving_robots, board.belt_turns[belts, old_cells])
+            self.occupancy[moving_games, old_cells] = -1
+            self.occupancy[moving_games, new_cells] = moving_robots
+            self.cells[moving_games, moving_robots] = new_cells
+            in_hole = board.holes[new_cells]
+            self.die(moving_games[in_hole], moving_robots[in_hole])
+            active = self.cells != board.nowhere
+
+    def set_robots_for_new_turn(self):
+        """
+        Remove robots with too many permanent damages, repair robots
+        and restart inactive robots on free start coordinates
+        (see State.set_robots_for_new_turn).
+        """
+        board = self.board
+        self.present &= self.permanent_damages < 10
+        for robot in range(self.robots_count):
+            cells = self.cells[:, robot]
+            active = self.present[:, robot] & (cells != board.nowhere)
+            repairs = numpy.where(active, board.repairs[cells], 0)
+            self.damages[:, robot] = numpy.maximum(self.damages[:, robot] - repairs, 0)
+
+            inactive = self.present[:, robot] & (cells == board.nowhere)
+            self.damages[inactive, robot] = 0
+            self.find_free_start(self.games[inactive], robot)
+
+    def find_free_start(self, games, robot):
+        """
+        Place the robot on the last free start coordinates he has got,
+        or on the first free start tile (see Robot.find_free_start).
+        """
+        times = self.start_times[games, robot]
+        order = numpy.argsort(-times, axis=1, kind="stable")
+        candidates = numpy.where(numpy.take_along_axis(times, order, axis=1) >= 0,
+                                 self.starts[order], self.board.nowhere)
+        start_tiles = numpy.tile(self.start_tiles, (len(games), 1))
+        candidates = numpy.concatenate((candidates, start_tiles), axis=1)
+        for index in range(candidates.shape[1]):
+            cells = candidates[:, index]
+            free = (cells != self.board.nowhere) & (self.occupancy[games, cells] < 0)
+            placed_games, cells = games[free], cells[free]
+            self.occupancy[placed_games, cells] = robot
+            self.cells[placed_games, robot] = cells
+            games, candidates = games[~free], candidates[~free]
+
+    def check_winner(self):
+        """
+        Mark robots who have collected all flags in games without winner
+        (see State.check_winner).
+        """
+        without_winner = self.won_round == 0
+        winners = self.present & (self.flags == self.flag_count) & without_winner[:, None]
+        self.winner |= winners
+        self.won_round[winners.any(axis=1)] = self.game_round
+
+
+def get_card_values(card):
+    """
+    Return kind, value and priority of the card for the program arrays.
+    The value is distance for movement cards and count of 90° steps
+    to the right for rotation cards.
+    """
+    if card is None:
+        return NO_CARD, 0, 0
+    if isinstance(card, MovementCard):
+        return MOVEMENT_CARD, card.distance, card.priority
+    return ROTATION_CARD, get_rotation_steps(card.rotation), card.priority
@@ -0,0 +1,161 @@
+"""
+Outcomes contain the cache of results of whole rounds.
+
+Bots, previews and tournaments often play the same position
+with the same programs again. The result of the registers
+(State.apply_all_effects) depends only on the robots, their programs
+and the map, so the cache remembers the robots and the game log entries
+at the end and puts them back instead of playing the registers again.
+
+The cache is opt-in, set it to the state (it can be shared
+by many states, also of different maps):
+
+    state.outcomes = OutcomeCache(maxsize=10000)
+
+The least recently used outcomes are thrown away when the cache is full.
+"""
+from collections import OrderedDict
+
+
+# Robot's attributes set from the outcome, in the order of values
+# in Robot.snapshot() (name and displayed name never change).
+RESTORED_ATTRIBUTES = (
+    (1, "coordinates"), (2, "lives"), (3, "flags"), (4, "damages"),
+    (5, "permanent_damages"), (6, "power_down"), (7, "direction"),
+    (9, "selection_confirmed"), (10, "winner"),
+)
+START_COORDINATES_INDEX = 8
+
+
+class Outcome:
+    """
+    Result of the registers of one round.
+
+    snapshots: robots' snapshots at the end (see Robot.snapshot),
+    for all robots playing at the start
+    remaining: indexes of robots which stay in the game
+    log: game log entries added by the registers
+    logged: True if the last log entry shows the robots at the end
+    """
+    __slots__ = ("snapshots", "remaining", "log", "logged")
+
+    def __init__(self, snapshots, remaining, log, logged):
+        self.snapshots = snapshots
+        self.remaining = remaining
+        self.log = log
+        self.logged = logged
+
+    def __repr__(self):
+        return "<Outcome {} log entries>".format(len(self.log))
+
+
+class OutcomeCache:
+    """
+    LRU cache of outcomes of the registers.
+
+    The key is the position (map, its start tiles, robots' snapshots,
+    which contain everything the registers depend on), robots' programs
+    and whether the last game log entry shows the robots.
+    States sharing the cache have to play by the same rules,
+    only the use of the table of transitions and of the region resolver
+    is in the key.
+    The 64-bit State.state_hash isn't used alone, it doesn't contain
+    power down, permanent damages and start coordinates, and
+    two different positions could have the same hash.
+
+    hits, misses, evictions: counts for statistics, see stats()
+    """
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        # OrderedDict {key: Outcome}, the most recently used outcome is the last.
+        self.outcomes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return "<OutcomeCache {}/{} outcomes>".format(len(self.outcomes), self.maxsize)
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def get_key(self, state, registers):
+        """
+        Return the key of the state's position with robots' programs.
+        """
+        programs = tuple(
+            tuple(None if card is None else (card.name, card.priority)
+                  for card in robot.program)
+            for robot in state.robots)
+        # The table of transitions and the region resolver change the order
+        # of the game log entries, see transitions.py and regions.py.
+        # When the last log entry already shows the robots, the registers
+        # don't add it again. Start tiles of the board (they depend
+        # on the count of players) are used for resurrecting robots.
+        return (state.grid, state.transitions is not None, state.regions is not None,
+                registers, state.logged_version == state.version, tuple(state.start_coordinates),
+                tuple(robot.snapshot() for robot in state.robots), programs)
+
+    def apply_all_effects(self, state, registers):
+        """
+        Put the outcome of the registers to the state,
+        play the registers and remember their outcome if it isn't known.
+        """
+        key = self.get_key(state, registers)
+        outcome = self.outcomes.get(key)
+        if outcome is not None:
+            self.hits += 1
+            self.outcomes.move_to_end(key)
+            self.restore(state, outcome)
+            return
+        self.misses += 1
+        robots = state.robots
+        log_length = len(state.log)
+        state.play_registers(registers)
+        remaining = {robot: index for index, robot in enumerate(robots)}
+        outcome = Outcome(
+            tuple(robot.snapshot() for robot in robots),
+            tuple(remaining[robot] for robot in state.robots),
+            tuple(state.log[log_length:]),
+            state.logged_version == state.version,
+        )
+        self.outcomes[key] = outcome
+        if len(self.outcomes) > self.maxsize:
+            self.outcomes.popitem(last=False)
+            self.evictions += 1
+
+    def restore(self, state, outcome):
+        """
+        Set robots of the state and add log entries from the outcome.
+        """
+        robots = state.robots
+        for robot, snapshot in zip(robots, outcome.snapshots):
+            for index, name in RESTORED_ATTRIBUTES:
+                setattr(robot, name, snapshot[index])
+            robot.start_coordinates = list(snapshot[START_COORDINATES_INDEX])
+        if len(outcome.remaining) != len(robots):
+            state.robots = [robots[index] for index in outcome.remaining]
+        state.log.extend(outcome.log)
+        if outcome.logged:
+            state.logged_version = state.version
+
+    def stats(self):
+        """
+        Return dictionary with statistics of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.outcomes),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0,
+        }
+
+    def clear(self):
+        """
+        Throw away all outcomes and statistics.
+        """
+        self.outcomes.clear()
+        self.hits = self.misses = self.evictions = 0
@@ -0,0 +1,294 @@
+"""
+Regions split robots into clusters which can't meet during a register.
+
+On large boards most robots are far from each other. A robot can only
+move by his card, by the cards of robots pushing him and by the board
+elements (belts and pushers), and he can only shoot along his row
+and column. Robots whose reach doesn't touch are in different clusters
+and each cluster plays the register on its own: cards, board elements,
+robot lasers and flags see only the robots of the cluster.
+
+The resolver is opt-in, set it to the state:
+
+    state.regions = RegionResolver()
+
+Clusters are played one after another in the order of their highest
+card priority and their game log entries are merged in this order,
+so the robots end the same as in the register played at once,
+only the log entries come cluster after cluster.
+The clusters aren't played in parallel: robots belong to one state
+and Python threads don't run Python code at the same time.
+"""
+from backend import MovementCard, RotationCard
+from util_backend import DIRECTIONS
+
+
+# How far the board elements can move a robot in one register:
+# express belts, all belts and a pusher by one tile each.
+BOARD_REACH = 3
+
+# Coordinates where the board can rotate robots, {grid: set of coordinates},
+# see get_rotating_cells().
+rotating_cells = {}
+# Board laser beams on coordinates, {grid: dictionary}, see get_beam_positions().
+beam_positions = {}
+
+
+class RegionResolver:
+    """
+    Plays registers by independent clusters of robots.
+
+    min_robots: the register is split only when there are
+    at least so many active robots, small games are played at once
+    split_registers: count of registers played by clusters
+    """
+    def __init__(self, min_robots=8):
+        self.min_robots = min_robots
+        self.split_registers = 0
+
+    def __repr__(self):
+        return "<RegionResolver min_robots: {}>".format(self.min_robots)
+
+    def apply_register(self, state, register):
+        """
+        Apply cards and all tile effects of the register cluster by cluster.
+
+        Return False and leave the state unchanged when the register
+        should be played at once: there are few robots, only one cluster
+        or a robot has no card.
+        """
+        robots = list(state.get_active_robots())
+        if len(robots) < self.min_robots:
+            return False
+        for robot in robots:
+            if not robot.power_down and robot.program[register] is None:
+                return False
+        clusters = get_clusters(state.grid, robots, register)
+        if len(clusters) < 2:
+            return False
+
+        self.split_registers += 1
+        all_robots = state.robots
+        state.record_log()
+        for cluster in clusters:
+            log_length = len(state.log)
+            state.robots = cluster
+            state.apply_register(register)
+            state.apply_tile_effects(register)
+            entries = state.log[log_length:]
+            del state.log[log_length:]
+            state.robots = all_robots
+            for entry in entries:
+                self.add_log_entry(state, entry)
+        if state.log and state.log[-1] == tuple(robot.snapshot() for robot in all_robots):
+            # Changing the robots of the state raised its version,
+            # but the last entry already shows the robots.
+            state.logged_version = state.version
+        return True
+
+    def add_log_entry(self, state, entry):
+        """
+        Add log entry of one cluster to the game log with all robots.
+
+        Robots of the other clusters are shown as they are now:
+        the clusters played before at the end of the register,
+        the clusters played after at its start.
+        """
+        snapshots = {snapshot[0]: snapshot for snapshot in entry}
+        full_entry = tuple(snapshots.get(robot.name) or robot.snapshot()
+                           for robot in state.robots)
+        if not state.log or state.log[-1] != full_entry:
+            state.log.append(full_entry)
+
+
+def get_card_direction(robot, register):
+    """
+    Return robot's direction after his card in the register.
+    """
+    card = None if robot.power_down else robot.program[register]
+    if isinstance(card, RotationCard):
+        return robot.direction.get_new_direction(card.rotation)
+    return robot.direction
+
+
+def get_card_distance(robot, register):
+    """
+    Return count of tiles the robot can go with his card in the register.
+    """
+    card = None if robot.power_down else robot.program[register]
+    if isinstance(card, MovementCard):
+        return abs(card.distance)
+    return 0
+
+
+def get_clusters(grid, robots, register):
+    """
+    Return list of clusters (lists of robots) which can't meet
+    during the register.
+
+    Clusters are ordered by the highest priority of their cards,
+    clusters without cards (power down) go last.
+    Robots in clusters keep their order.
+    """
+    # Start with one cluster for every robot and join clusters
+    # which can reach each other, until nothing changes.
+    # Robot can be pushed by all robots of his cluster, so the reach
+    # grows when clusters are joined.
+    order = {robot: position for position, robot in enumerate(robots)}
+    clusters = [[robot] for robot in robots]
+    # Dictionary {tuple of robots: (area, influence)}, clusters
+    # which weren't joined aren't computed again.
+    reaches = {}
+    while len(clusters) > 1:
+        cluster_by_cell = {}
+        for index, cluster in enumerate(clusters):
+            key = tuple(cluster)
+            if key not in reaches:
+                reaches[key] = get_reach(grid, cluster, register)
+            for coordinates in reaches[key][0]:
+                cluster_by_cell[coordinates] = index
+
+        # Union-find of cluster indexes.
+        parents = list(range(len(clusters)))
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        joined = False
+        for index, cluster in enumerate(clusters):
+            influence = reaches[tuple(cluster)][1]
+            others = {cluster_by_cell[coordinates]
+                      for coordinates in cluster_by_cell.keys() & influence}
+            for other in others:
+                root, other_root = find(index), find(other)
+                if root != other_root:
+                    parents[other_root] = root
+                    joined = True
+        if not joined:
+            break
+        groups = {}
+        for index, cluster in enumerate(clusters):
+            groups.setdefault(find(index), []).extend(cluster)
+        clusters = [sorted(group, key=order.__getitem__) for group in groups.values()]
+
+    def priority(cluster):
+        cards = [robot.program[register] for robot in cluster if not robot.power_down]
+        return max((card.priority for card in cards), default=-1)
+    clusters.sort(key=lambda cluster: (-priority(cluster), order[cluster[0]]))
+    return clusters
+
+
+def get_reach(grid, cluster, register):
+    """
+    Return area where robots of the cluster can stand during the register
+    and their influence (see get_influence).
+
+    Robots shoot only in their direction after the card,
+    unless the board can rotate them.
+    """
+    radius = sum(get_card_distance(robot, register) for robot in cluster) + BOARD_REACH
+    area = get_area(grid, [robot.coordinates for robot in cluster], radius)
+    if area.isdisjoint(get_rotating_cells(grid)):
+        directions = {get_card_direction(robot, register) for robot in cluster}
+    else:
+        directions = DIRECTIONS
+    return area, get_influence(grid, area, directions)
+
+
+def get_area(grid, coordinates_list, radius):
+    """
+    Return set of coordinates on the board within the radius
+    (count of steps, walls aren't taken into account) from the coordinates.
+    """
+    area = set()
+    for x, y in coordinates_list:
+        for dy in range(-radius, radius + 1):
+            row = y + dy
+            if not 0 <= row < grid.height:
+                continue
+            width = radius - abs(dy)
+            for column in range(max(x - width, 0), min(x + width, grid.width - 1) + 1):
+                area.add((column, row))
+    return area
+
+
+def get_influence(grid, area, directions):
+    """
+    Return set of coordinates robots standing in the area can affect:
+    the area, tiles their lasers can reach in the given directions
+    and board laser beams behind them (a robot stops the laser
+    for the robots behind him).
+    """
+    influence = set(area)
+    rows = {}
+    columns = {}
+    for x, y in area:
+        row = rows.setdefault(y, [x, x])
+        row[0], row[1] = min(row[0], x), max(row[1], x)
+        column = columns.setdefault(x, [y, y])
+        column[0], column[1] = min(column[0], y), max(column[1], y)
+    # Laser from any tile of the line goes at most as far as the laser
+    # from the last tile of the line in the same direction.
+    # The whole line is added, the area can have gaps in it.
+    sight = grid.sight
+    for direction in directions:
+        index = direction.index
+        dx, dy = direction.coor_delta
+        if dx:
+            for y, (first, last) in rows.items():
+                if dx > 0:
+                    stop = last + sight[grid.cell_id((last, y)) * 4 + index]
+                    influence.update((x, y) for x in range(first, stop + 1))
+                else:
+                    start = first - sight[grid.cell_id((first, y)) * 4 + index]
+                    influence.update((x, y) for x in range(start, last + 1))
+        else:
+            for x, (first, last) in columns.items():
+                if dy > 0:
+                    stop = last + sight[grid.cell_id((x, last)) * 4 + index]
+                    influence.update((x, y) for y in range(first, stop + 1))
+                else:
+                    start = first - sight[grid.cell_id((x, first)) * 4 + index]
+                    influence.update((x, y) for y in range(start, last + 1))
+    beam_positions = get_beam_positions(grid)
+    first_positions = {}
+    for coordinates in area:
+        for beam, position in beam_positions.get(coordinates, ()):
+            if position < first_positions.get(beam, len(beam.cells)):
+                first_positions[beam] = position
+    for beam, position in first_positions.items():
+        influence.update(beam.cells[position:])
+    return influence
+
+
+def get_beam_positions(grid):
+    """
+    Return dictionary {coordinates: list of (laser beam, position in the beam)}
+    of the board laser beams going through the coordinates.
+    """
+    positions = beam_positions.get(grid)
+    if positions is None:
+        positions = {}
+        for beam in grid.laser_beams:
+            for position, coordinates in enumerate(beam.cells):
+                positions.setdefault(coordinates, []).append((beam, position))
+        beam_positions[grid] = positions
+    return positions
+
+
+def get_rotating_cells(grid):
+    """
+    Return set of coordinates where the board can rotate a robot
+    (gears and belts going to rotating belts).
+    """
+    cells = rotating_cells.get(grid)
+    if cells is None:
+        cells = set(grid.gear_cells)
+        for belts in grid.express_belts, grid.all_belts:
+            cells.update(coordinates for coordinates, (next_coordinates, rotations)
+                         in belts.items() if rotations)
+        rotating_cells[grid] = cells
+    return cells
@@ -28,10 +28,10 @@ class Server:
 
     Handle diconnection nicely - remove those clients from the list.
     """
-    def __init__(self, map_name, players):
+    def __init__(self, map_name, players, seed=None):
         # Attributes related to game logic
         self.map_name = map_name
-        self.state = State.get_start_state(map_name, players)
+        self.state = State.get_start_state(map_name, players, seed)
         self.available_robots = list(self.state.robots)
         # Dictionary {robot_name: ws_interface}
         self.assigned_robots = {}
@@ -196,7 +196,7 @@ class Server:
         round end, current robots' state and the new cards for players.
         """
         self.state.play_round()
-        await self.send_message({'log': self.state.log[self.last_sent_log_position:]})
+        await self.send_message(self.state.log_as_dict(self.last_sent_log_position))
         self.last_sent_log_position = len(self.state.log)
         if self.state.winners:
             await self.send_message({"winner": self.state.winners})
@@ -254,8 +254,10 @@ def get_app(server):
 @click.option("-m", "--map-name", default="maps/belt_map.json",
               help="Name of the played map.")
 @click.option("-p", "--players", help="Number of players", type=int)
-def main(map_name, players):
-    server = Server(map_name, players)
+@click.option("-s", "--seed", type=int,
+              help="Seed for shuffling cards, the same seed gives the same cards.")
+def main(map_name, players, seed):
+    server = Server(map_name, players, seed)
     app = get_app(server)
     web.run_app(app)
 
@@ -0,0 +1,319 @@
+"""
+Simulator plays whole games without the server and the graphic clients.
+
+Robots' programs are chosen by policies (see POLICIES), games are spread
+over several processes. It is used for testing changes of the game logic
+on many games and for measuring how fast the game is.
+
+Run the file from the root directory of the project, for example:
+    python simulator.py -m maps/belt_map.json -n 100 --policy flag --policy random
+
+Or use it from Python:
+    results = simulate_games("maps/belt_map.json", games=100)
+    print(format_summary(summarize(results)))
+"""
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from time import perf_counter
+
+import click
+
+from backend import State, MovementCard
+from util_backend import get_next_coordinates
+
+
+MAX_ROUNDS = 100
+# Distance used by flag_policy for coordinates the flag can't be reached from.
+UNREACHABLE = float("inf")
+
+
+def random_policy(robot, state):
+    """
+    Choose no cards, the program is filled with random cards
+    by Robot.select_cards().
+    """
+    return []
+
+
+def forward_policy(robot, state):
+    """
+    Choose movement cards with the longest distance first,
+    then the rotation cards.
+    """
+    def card_distance(index):
+        card = robot.dealt_cards[index]
+        if isinstance(card, MovementCard):
+            return card.distance
+        # Rotation cards go after all movement cards.
+        return -2
+    indexes = sorted(range(len(robot.dealt_cards)), key=card_distance, reverse=True)
+    return indexes[:robot.unblocked_cards]
+
+
+def flag_policy(robot, state):
+    """
+    Choose cards which bring the robot nearest to the next flag.
+
+    Effects of cards are only guessed - tiles and other robots are not
+    taken into account. For every register the card with the shortest
+    distance to the flag (see Grid.get_flag_distances) is chosen.
+    """
+    flag_number = robot.flags + 1
+    if flag_number not in state.grid.get_flag_distances() or robot.inactive:
+        return []
+    coordinates, direction = robot.coordinates, robot.direction
+    free_indexes = list(range(len(robot.dealt_cards)))
+    card_indexes = []
+    for register in range(robot.unblocked_cards):
+        best = None
+        for index in free_indexes:
+            new_coordinates, new_direction = guess_card_effect(
+                robot.dealt_cards[index], coordinates, direction)
+            distance = state.grid.get_flag_distance(new_coordinates, flag_number)
+            if distance is None:
+                # The robot would die or he can't get to the flag from there.
+                distance = UNREACHABLE
+            if best is None or distance < best[0]:
+                best = distance, index, new_coordinates, new_direction
+        if best is None:
+            break
+        distance, index, coordinates, direction = best
+        free_indexes.remove(index)
+        card_indexes.append(index)
+    return card_indexes
+
+
+# Policies which can be chosen by name.
+# Policy is a function which gets robot and state and returns list of indexes
+# of robot's dealt cards, one for every register (as robot.card_indexes).
+# Registers left out are filled with random cards.
+POLICIES = {
+    "random": random_policy,
+    "forward": forward_policy,
+    "flag": flag_policy,
+}
+
+
+def guess_card_effect(card, coordinates, direction):
+    """
+    Return robot's coordinates and direction after the card effect
+    on the empty board.
+    """
+    if isinstance(card, MovementCard):
+        if card.distance < 0:
+            move_direction = direction.opposite
+        else:
+            move_direction = direction
+        for step in range(abs(card.distance)):
+            coordinates = get_next_coordinates(coordinates, move_direction)
+        return coordinates, direction
+    return coordinates, direction.get_new_direction(card.rotation)
+
+
+def get_policy(policy):
+    """
+    Return policy function of the given name.
+    Functions are returned as they are, so own policies can be used.
+    """
+    if callable(policy):
+        return policy
+    return POLICIES[policy]
+
+
+def timed(phase, method):
+    """
+    Return method which adds the time spent in the method
+    to state's timings of the given phase.
+    """
+    def timed_method(self, *args):
+        start = perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0) + perf_counter() - start
+    return timed_method
+
+
+class SimulatedState(State):
+    """
+    State which measures time of the game phases and counts robots' deaths.
+
+    Phase "tiles" contains the whole register phase (see
+    State.apply_tile_effects), "belts" is the part spent on conveyor belts.
+    """
+    def __init__(self, board, robots, seed=None):
+        # Dictionary {phase: seconds}
+        self.timings = {}
+        self.deaths = 0
+        super().__init__(board, robots, seed)
+
+    apply_register = timed("cards", State.apply_register)
+    apply_tile_effects = timed("tiles", State.apply_tile_effects)
+    move_belts = timed("belts", State.move_belts)
+    set_robots_for_new_turn = timed("new turn", State.set_robots_for_new_turn)
+    deal_cards = timed("dealing", State.deal_cards)
+
+    def robot_changed(self, robot, name, old_value, new_value):
+        super().robot_changed(robot, name, old_value, new_value)
+        # Only dead robot leaves the board.
+        if name == "coordinates" and new_value is None:
+            self.deaths += 1
+
+
+class GameResult:
+    """
+    Result of one simulated game.
+
+    rounds: count of played rounds
+    winners: names of robots who have won, empty if nobody has won
+    winner_policies: names of policies of the winners
+    deaths: count of robots' deaths
+    timings: dictionary {phase: seconds}
+    """
+    def __init__(self, map_name, seed, rounds, winners, winner_policies, deaths, timings):
+        self.map_name = map_name
+        self.seed = seed
+        self.rounds = rounds
+        self.winners = winners
+        self.winner_policies = winner_policies
+        self.deaths = deaths
+        self.timings = timings
+
+    def __repr__(self):
+        return "<GameResult {} seed: {} rounds: {} winners: {} deaths: {}>".format(
+            self.map_name, self.seed, self.rounds, self.winners, self.deaths)
+
+
+def play_game(map_name, seed, policies=("random",), players=None, max_rounds=MAX_ROUNDS):
+    """
+    Play one game until somebody wins or max_rounds are played.
+
+    policies: names of policies (or policy functions), the first robot plays
+    with the first policy, the second with the second one etc.,
+    when there are more robots than policies, the policies repeat.
+    Return GameResult.
+    """
+    state = SimulatedState.get_start_state(map_name, players, seed)
+    robot_policies = {}
+    for index, robot in enumerate(state.robots):
+        robot_policies[robot.name] = policies[index % len(policies)]
+    start = perf_counter()
+    while not state.winners and state.robots and state.game_round <= max_rounds:
+        policy_start = perf_counter()
+        for robot in state.robots:
+            policy = get_policy(robot_policies[robot.name])
+            robot.card_indexes = policy(robot, state)
+        state.timings["policies"] = (state.timings.get("policies", 0)
+                                     + perf_counter() - policy_start)
+        state.play_round()
+    state.timings["total"] = perf_counter() - start
+    winners = [robot.name for robot in state.robots if robot.winner]
+    winner_policies = [get_policy_name(robot_policies[name]) for name in winners]
+    return GameResult(map_name, seed, state.game_round - 1, winners,
+                      winner_policies, state.deaths, state.timings)
+
+
+def get_policy_name(policy):
+    """
+    Return name of the policy for reports.
+    """
+    if callable(policy):
+        return policy.__name__
+    return policy
+
+
+def simulate_games(map_name, games=10, policies=("random",), players=None,
+                   max_rounds=MAX_ROUNDS, seed=0, workers=None):
+    """
+    Play games and return list of their GameResults.
+
+    Games get seeds seed, seed + 1, ..., so the same arguments
+    always give the same games.
+    workers: count of processes, None for the count of processors;
+    with 1 the games are played in this process.
+    Own policy functions must be defined in a module (not lambda),
+    so they can be sent to other processes.
+    """
+    seeds = range(seed, seed + games)
+    arguments = (repeat(map_name), seeds, repeat(tuple(policies)),
+                 repeat(players), repeat(max_rounds))
+    if workers == 1:
+        return list(map(play_game, *arguments))
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(play_game, *arguments))
+
+
+def summarize(results):
+    """
+    Return dictionary with summary of the games' results.
+    """
+    won = [result for result in results if result.winners]
+    rounds_to_win = [result.rounds for result in won]
+    rounds = sum(result.rounds for result in results)
+    timings = {}
+    for result in results:
+        for phase, seconds in result.timings.items():
+            timings[phase] = timings.get(phase, 0) + seconds
+    policy_wins = {}
+    for result in won:
+        for policy in result.winner_policies:
+            policy_wins[policy] = policy_wins.get(policy, 0) + 1
+    return {
+        "games": len(results),
+        "won": len(won),
+        "rounds": rounds,
+        "rounds_to_win_mean": statistics.mean(rounds_to_win) if rounds_to_win else None,
+        "rounds_to_win_median": statistics.median(rounds_to_win) if rounds_to_win else None,
+        "rounds_to_win_max": max(rounds_to_win, default=None),
+        "deaths": sum(result.deaths for result in results),
+        "policy_wins": policy_wins,
+        "timings": timings,
+    }
+
+
+def format_summary(summary):
+    """
+    Return summary of games as text for printing.
+    """
+    lines = ["Games: {games}, won: {won}, rounds played: {rounds}".format(**summary)]
+    if summary["won"]:
+        lines.append(
+            "Rounds to win: mean {rounds_to_win_mean:.1f}, median "
+            "{rounds_to_win_median}, max {rounds_to_win_max}".format(**summary))
+        for policy, wins in sorted(summary["policy_wins"].items()):
+            lines.append("Wins of policy {}: {}".format(policy, wins))
+    if summary["games"]:
+        lines.append("Deaths: {}, per game {:.1f}".format(
+            summary["deaths"], summary["deaths"] / summary["games"]))
+    lines.append("Phase timings (total seconds, milliseconds per round):")
+    for phase, seconds in sorted(summary["timings"].items()):
+        per_round = seconds / summary["rounds"] * 1000 if summary["rounds"] else 0
+        lines.append("  {:10} {:8.3f} {:8.3f}".format(phase, seconds, per_round))
+    return "\n".join(lines)
+
+
+@click.command()
+@click.option("-m", "--map-name", default="maps/belt_map.json",
+              help="Name of the played map.")
+@click.option("-n", "--games", default=10, help="Number of games.")
+@click.option("-p", "--players", help="Number of players", type=int)
+@click.option("--policy", "policies", multiple=True, default=["random"],
+              type=click.Choice(sorted(POLICIES)),
+              help="Policy choosing robots' cards, can be repeated.")
+@click.option("-r", "--max-rounds", default=MAX_ROUNDS,
+              help="Maximum number of rounds of one game.")
+@click.option("-s", "--seed", default=0, help="Seed of the first game.")
+@click.option("-w", "--workers", type=int,
+              help="Number of processes, default is number of processors.")
+def main(map_name, games, players, policies, max_rounds, seed, workers):
+    start = perf_counter()
+    results = simulate_games(map_name, games, policies, players, max_rounds, seed, workers)
+    duration = perf_counter() - start
+    print("Map: {}, policies: {}".format(map_name, ", ".join(policies)))
+    print(format_summary(summarize(results)))
+    print("Games per second: {:.1f}".format(len(results) / duration))
+
+
+if __name__ == '__main__':
+    main()
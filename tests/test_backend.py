@@ -2,7 +2,9 @@ import pytest
 
 from backend import Robot, State, MovementCard
 from backend import RotationCard, get_direction_from_coordinates
-from backend import get_robot_names
+from backend import get_robot_names, OccupancyIndexError, CheckpointError
+from backend import StateHashError
+from backend import stop_colliding_robots, stop_swapping_robots
 from util_backend import Direction, Rotation
 from tile import Tile
 
@@ -17,7 +19,7 @@ def test_start_state():
     assert isinstance(ss.robots, list)
     assert isinstance(ss.robots[0], Robot)
     assert isinstance(ss._board, dict)
-    assert isinstance(ss._board[0, 0], list)
+    assert isinstance(ss._board[0, 0], tuple)
     assert isinstance(ss._board[0, 0][0], Tile)
 
 
@@ -357,3 +359,429 @@ def test_find_another_robots_start_coordinates():
     state.robots[1].coordinates = (5, 5)
     state.robots[0].find_free_start(state)
     assert state.robots[0].coordinates == (1, 0)
+
+
+def test_plan_respawns_gives_different_starts():
+    """
+    Assert two dead robots with the same last start coordinates
+    don't get the same coordinates and cells of active robots are skipped.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    first, second, third = state.robots[:3]
+    first.start_coordinates = [(1, 0), (5, 5)]
+    second.start_coordinates = [(5, 5)]
+    third.coordinates = (1, 0)
+    first.coordinates = None
+    second.coordinates = None
+    respawns = state.plan_respawns()
+    assert respawns[first] == (5, 5)
+    assert respawns[second] not in ((5, 5), (1, 0))
+    assert respawns[second] in state.start_coordinates
+    assert third not in respawns
+
+
+def test_new_turn_respawns_dead_robots():
+    """
+    Assert dead robots are placed on free start coordinates in the new turn.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    first, second = state.robots[:2]
+    first.start_coordinates = second.start_coordinates = [(5, 5)]
+    first.die(state)
+    second.die(state)
+    state.set_robots_for_new_turn()
+    assert first.coordinates == (5, 5)
+    assert second.coordinates not in (None, (5, 5))
+    state.check_occupancy()
+
+
+def test_occupancy_follows_robots():
+    """
+    Assert the index of robots' coordinates is updated when robots
+    walk, die or are placed elsewhere.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    robot = state.robots[0]
+    start = robot.coordinates
+    robot.walk(1, state)
+    assert start not in state.occupancy
+    assert state.check_robot_in_the_way(robot.coordinates) is robot
+    robot.die(state)
+    assert robot not in state.occupancy.values()
+    robot.coordinates = (5, 5)
+    assert state.check_robot_in_the_way((5, 5)) is robot
+    state.check_occupancy()
+
+
+def test_occupancy_rebuilt_with_new_robots():
+    """
+    Assert the index is rebuilt when the list of robots is replaced
+    and the old robots don't update it anymore.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    old_robot = state.robots[0]
+    state.robots = state.robots[1:]
+    old_robot.coordinates = (5, 5)
+    assert state.check_robot_in_the_way((5, 5)) is None
+    state.check_occupancy()
+
+
+def test_occupancy_debug_mode():
+    """
+    Assert debug mode finds out the index is out of date.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    state.debug = True
+    state.occupancy.clear()
+    with pytest.raises(OccupancyIndexError):
+        state.check_robot_in_the_way((0, 0))
+
+
+def test_robot_shoots_nearest_robot():
+    """
+    Assert the robot laser hits only the nearest robot in its direction.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    shooter, first, second = state.robots[:3]
+    shooter.coordinates, shooter.direction = (3, 3), Direction.N
+    first.coordinates = (3, 6)
+    second.coordinates = (3, 8)
+    shooter.shoot(state)
+    assert first.damages == 1
+    assert second.damages == 0
+
+
+def test_robot_laser_stops_at_wall():
+    """
+    Assert the robot laser doesn't pass a wall.
+    There is a wall on the east side of the tile (3, 3).
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    shooter, target = state.robots[:2]
+    shooter.coordinates, shooter.direction = (2, 3), Direction.E
+    target.coordinates = (4, 3)
+    shooter.shoot(state)
+    assert target.damages == 0
+    target.coordinates = (3, 3)
+    shooter.shoot(state)
+    assert target.damages == 1
+
+
+def test_stop_colliding_robots_chain():
+    """
+    Assert robots going to the same tile are stopped and the robot going
+    to the tile of a stopped robot is stopped too.
+    """
+    first = Robot(Direction.N, (0, 0), "bender")
+    second = Robot(Direction.N, (2, 0), "bishop")
+    third = Robot(Direction.N, (0, 1), "cyberbot")
+    robots_next_coordinates = {first: (1, 0), second: (1, 0), third: (0, 0)}
+    stop_colliding_robots(robots_next_coordinates)
+    assert robots_next_coordinates == {first: (0, 0), second: (2, 0), third: (0, 1)}
+
+
+def test_stop_swapping_robots():
+    """
+    Assert robots switching their tiles are stopped, others move.
+    """
+    first = Robot(Direction.N, (0, 0), "bender")
+    second = Robot(Direction.N, (1, 0), "bishop")
+    third = Robot(Direction.N, (3, 0), "cyberbot")
+    robots_next_coordinates = {first: (1, 0), second: (0, 0), third: (4, 0)}
+    stop_swapping_robots(robots_next_coordinates)
+    assert robots_next_coordinates == {first: (0, 0), second: (1, 0), third: (4, 0)}
+
+
+def test_start_coordinates_are_not_repeated():
+    """
+    Assert coordinates visited again are moved to the end of robot's
+    start coordinates instead of being added twice.
+    """
+    robot = Robot(Direction.N, (0, 0), "bender")
+    for coordinates in (1, 1), (2, 2), (1, 1), (2, 2), (2, 2):
+        robot.add_start_coordinates(coordinates)
+    assert robot.start_coordinates == [(0, 0), (1, 1), (2, 2)]
+
+
+def test_robot_and_cards_have_fixed_attributes():
+    """
+    Assert robots and cards can't get attributes they don't know.
+    """
+    for instance in (Robot(Direction.N, (0, 0), "bender"), MovementCard(100, 1),
+                     RotationCard(100, Rotation.LEFT)):
+        with pytest.raises(AttributeError):
+            instance.unknown_attribute = 1
+
+
+def test_record_log_skips_unchanged_robots():
+    """
+    Assert a new log entry is recorded only when some robot has changed.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    state.record_log()
+    state.record_log()
+    assert len(state.log) == 1
+    robot = state.robots[0]
+    robot.direction = robot.direction
+    state.record_log()
+    assert len(state.log) == 1
+    robot.direction = robot.direction.get_new_direction(Rotation.LEFT)
+    state.record_log()
+    assert len(state.log) == 2
+
+
+def test_record_log_skips_new_start_coordinates():
+    """
+    Assert new start coordinates alone don't make a new log entry,
+    they are logged with the next change of the robot.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    state.record_log()
+    robot = state.robots[0]
+    robot.add_start_coordinates((1, 1))
+    state.record_log()
+    assert len(state.log) == 1
+    robot.damages = 1
+    state.record_log()
+    assert len(state.log) == 2
+    assert state.log_as_dict(1)["log"][0]["robots"][0]["robot_data"]["start_coordinates"][-1] \
+        == (1, 1)
+
+
+def test_only_logged_attributes_change_version():
+    """
+    Assert cards are plain attributes which don't raise the version
+    of the state, logged attributes do.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    robot = state.robots[0]
+    version = state.version
+    robot.program = [MovementCard(100, 1)] * 5
+    robot.card_indexes = [0, 1, 2, 3, 4]
+    robot.dealt_cards = []
+    assert state.version == version
+    robot.lives = 2
+    assert state.version == version + 1
+
+
+def test_robot_snapshot_is_renewed_after_change():
+    """
+    Assert robot's snapshot is kept until the robot changes.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    robot = state.robots[0]
+    snapshot = robot.snapshot()
+    assert robot.snapshot() is snapshot
+    robot.damages = 3
+    assert robot.snapshot() is not snapshot
+    assert robot.snapshot()[4] == 3
+
+
+def test_log_as_dict():
+    """
+    Assert the log is sent with the same robots' data as robots_as_dict.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    state.record_log()
+    state.robots[0].walk(1, state)
+    assert state.log_as_dict(1) == {"log": [state.robots_as_dict()]}
+    assert len(state.log_as_dict()["log"]) == 2
+
+
+def test_same_seed_plays_the_same_game():
+    """
+    Assert two states with the same seed deal the same cards
+    and end the rounds in the same log.
+    """
+    states = [State.get_start_state("maps/belt_map.json", seed=42) for i in range(2)]
+    for state in states:
+        for i in range(3):
+            state.play_round()
+    assert states[0].seed == 42
+    assert states[0].log_as_dict() == states[1].log_as_dict()
+    assert ([card.priority for card in states[0].present_deck]
+            == [card.priority for card in states[1].present_deck])
+
+
+def test_states_have_own_random_generators():
+    """
+    Assert shuffling cards in one state doesn't change cards of another state.
+    """
+    first = State.get_start_state("maps/belt_map.json", seed=1)
+    second = State.get_start_state("maps/belt_map.json", seed=1)
+    first.create_card_pack()
+    second_cards = [card.priority for card in second.create_card_pack()]
+    third = State.get_start_state("maps/belt_map.json", seed=1)
+    assert second_cards == [card.priority for card in third.create_card_pack()]
+
+
+def get_cards_and_robots(state):
+    """
+    Return everything the rounds change: robots with their cards, decks,
+    log, winners and state of the random generator.
+    """
+    def priorities(cards):
+        return [None if card is None else card.priority for card in cards]
+    return (
+        state.robots_as_dict(),
+        [(priorities(robot.program), priorities(robot.dealt_cards), robot.card_indexes)
+         for robot in state.robots],
+        priorities(state.present_deck), priorities(state.past_deck),
+        state.log_as_dict(), list(state.winners), state.game_round,
+        state.version, state.random.getstate(), dict(state.occupancy),
+        state.state_hash,
+    )
+
+
+def test_rollback_to_checkpoint():
+    """
+    Assert rollback undoes whole rounds and the same rounds
+    are played again after it.
+    """
+    state = State.get_start_state("maps/belt_map.json", seed=3)
+    state.play_round()
+    before = get_cards_and_robots(state)
+    checkpoint = state.checkpoint()
+    for i in range(5):
+        state.play_round()
+    after = get_cards_and_robots(state)
+    state.rollback(checkpoint)
+    assert get_cards_and_robots(state) == before
+    for i in range(5):
+        state.play_round()
+    assert get_cards_and_robots(state) == after
+
+
+def test_rollback_nested_checkpoints():
+    """
+    Assert the state can be rolled back to inner and outer checkpoints
+    and the checkpoint can be used again.
+    """
+    state = State.get_start_state("maps/killer_map.json", seed=5)
+    outer_state = get_cards_and_robots(state)
+    outer = state.checkpoint()
+    state.play_round()
+    inner_state = get_cards_and_robots(state)
+    inner = state.checkpoint()
+    for i in range(2):
+        state.play_round()
+        state.rollback(inner)
+        assert get_cards_and_robots(state) == inner_state
+    state.rollback(outer)
+    assert get_cards_and_robots(state) == outer_state
+    with pytest.raises(CheckpointError):
+        state.rollback(inner)
+
+
+def test_rollback_returns_removed_robots():
+    """
+    Assert robots removed from the game come back after rollback.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    robots = state.robots
+    checkpoint = state.checkpoint()
+    robots[0].permanent_damages = 10
+    state.set_robots_for_new_turn()
+    assert robots[0] not in state.robots
+    state.rollback(checkpoint)
+    assert state.robots is robots
+    assert state.check_robot_in_the_way(robots[0].coordinates) is robots[0]
+    robots[0].damages = 2
+    assert state.version == checkpoint.version + 1
+
+
+def test_rollback_needs_journal():
+    """
+    Assert the state can't be rolled back when the journal is stopped.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    checkpoint = state.checkpoint()
+    state.stop_journal()
+    with pytest.raises(CheckpointError):
+        state.rollback(checkpoint)
+
+
+def test_state_hash_follows_robots():
+    """
+    Assert the state hash is updated with every change of robots
+    and it is the same for the same robots.
+    """
+    state = State.get_start_state("maps/belt_map.json", seed=1)
+    other = State.get_start_state("maps/belt_map.json", seed=2)
+    start_hash = state.state_hash
+    assert start_hash == other.state_hash
+    for i in range(5):
+        state.play_round()
+        state.check_state_hash()
+    assert state.state_hash != start_hash
+    robot = state.robots[0]
+    state_hash = state.state_hash
+    robot.damages += 1
+    assert state.state_hash != state_hash
+    robot.damages -= 1
+    assert state.state_hash == state_hash
+    # Attributes which aren't in the hash don't change it.
+    robot.power_down = not robot.power_down
+    assert state.state_hash == state_hash
+
+
+def test_state_hash_error():
+    """
+    Assert changes of robots behind the state's back are found.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    state.robots[0]._lives = 1
+    with pytest.raises(StateHashError):
+        state.check_state_hash()
+
+
+def test_states_share_map_info_and_grid():
+    """
+    Assert states on the same map share its MapInfo and grid.
+    """
+    first = State.get_start_state("maps/test_maps/test_6.json")
+    second = State.get_start_state("maps/test_maps/test_6.json")
+    assert first.grid is second.grid
+    assert first.map_info is second.map_info
+    assert first.tile_count == (6, 4)
+    assert first.flag_count == 1
+
+
+def test_robot_pushes_chain_of_robots():
+    """
+    Assert the walking robot pushes the whole chain of robots in front of him
+    and the first robot of the chain falls out of the board.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    pusher, first, second, third = state.robots[:4]
+    pusher.coordinates, pusher.direction = (8, 0), Direction.E
+    first.coordinates, second.coordinates, third.coordinates = (9, 0), (10, 0), (11, 0)
+    state.record_log()
+    pusher.walk(1, state)
+    assert pusher.coordinates == (9, 0)
+    assert first.coordinates == (10, 0)
+    assert second.coordinates == (11, 0)
+    assert third.inactive
+    assert state.check_robot_in_the_way((11, 0)) is second
+    # The falling robot is logged, the pushed robots move with the pusher.
+    assert [[snapshot[1] for snapshot in entry[:4]] for entry in state.log] == [
+        [(8, 0), (9, 0), (10, 0), (11, 0)],
+        [(8, 0), (9, 0), (10, 0), (12, 0)],
+        [(8, 0), (9, 0), (10, 0), None],
+        [(9, 0), (10, 0), (11, 0), None],
+    ]
+
+
+def test_chain_of_robots_stops_at_wall():
+    """
+    Assert nobody moves when there is a wall in front of the chain of robots.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    pusher, robot = state.robots[:2]
+    pusher.coordinates, pusher.direction = (3, 5), Direction.E
+    robot.coordinates = (4, 5)
+    state.record_log()
+    pusher.walk(2, state)
+    assert pusher.coordinates == (3, 5)
+    assert robot.coordinates == (4, 5)
+    assert len(state.log) == 1
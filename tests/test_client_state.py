@@ -0,0 +1,85 @@
+"""
+Tests of the clients' view of the game (client_state.py).
+"""
+from backend import State
+from client_state import GameView, RobotView, robots_from_dict
+from util_backend import Direction
+
+
+def get_game_view():
+    """
+    Return state of the test map and the game view created from it.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    data = state.whole_as_dict("maps/test_maps/test_3.json")
+    return state, GameView.from_dict(data)
+
+
+def test_game_view_from_dict():
+    """
+    Assert the game view has the board, sizes and robots of the state.
+    """
+    state, game_view = get_game_view()
+    assert game_view.tile_count == state.tile_count
+    assert game_view.flag_count == state.flag_count
+    assert game_view.board[0, 11][0].direction == Direction.N
+    assert [robot.name for robot in game_view.robots] == [robot.name for robot in state.robots]
+    assert game_view.robots[0].coordinates == (0, 1)
+    assert game_view.robots[0].direction == state.robots[0].direction
+
+
+def test_robots_are_updated_in_place():
+    """
+    Assert robots sent from server change the known robots
+    and robots which aren't sent any more are removed.
+    """
+    state, game_view = get_game_view()
+    robots = list(game_view.robots)
+    state.robots[0].damages = 3
+    state.robots[0].coordinates = None
+    state.robots = state.robots[:-1]
+    game_view.update_robots(state.robots_as_dict())
+    assert game_view.robots == robots[:-1]
+    assert robots[0].damages == 3
+    assert robots[0].inactive
+
+
+def test_game_view_hash_matches_state():
+    """
+    Assert the game view has the same hash as the state it was sent from.
+    """
+    state, game_view = get_game_view()
+    assert game_view.get_state_hash() == state.state_hash
+    state.robots[1].direction = Direction.W
+    state.robots[0].coordinates = None
+    game_view.update_robots(state.robots_as_dict())
+    assert game_view.get_state_hash() == state.state_hash
+
+
+def test_robot_view_keeps_last_position():
+    """
+    Assert the robot keeps his position before the update in place
+    and new robot starts where he is.
+    """
+    state, game_view = get_game_view()
+    robot = game_view.robots[0]
+    last = robot.last
+    assert (last.coordinates, last.direction, last.damages) == (
+        robot.coordinates, robot.direction, robot.damages)
+    state.robots[0].coordinates = (1, 1)
+    state.robots[0].damages = 2
+    game_view.update_robots(state.robots_as_dict())
+    assert robot.last is last
+    assert (last.coordinates, last.damages) == ((0, 1), 0)
+    assert (robot.coordinates, robot.damages) == ((1, 1), 2)
+
+
+def test_robots_from_dict():
+    """
+    Assert robot views are created from robots' data.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    robots = robots_from_dict(state.robots_as_dict())
+    assert all(isinstance(robot, RobotView) for robot in robots)
+    assert [robot.displayed_name for robot in robots] == [
+        robot.displayed_name for robot in state.robots]
@@ -0,0 +1,89 @@
+"""
+Tests of the board effects compiled for maps (compiler.py).
+
+The compiled function is compared with State.apply_board_effects
+on the test maps (see test_effects.py) and on random games.
+"""
+import pytest
+
+from backend import State
+from compiler import get_board_effects, generate_source, literal
+from loading import get_board, board_from_data, get_map_data
+from grid import get_grid
+from util_backend import Direction, Rotation
+from tests.test_effects import get_test_names, get_test_state
+
+
+@pytest.mark.parametrize("test_name", get_test_names())
+def test_compiled_effects_play_test_maps(test_name):
+    """
+    Play the test maps with the compiled board effects
+    and assert the robots and the game log are the same as without them.
+    """
+    state, registers = get_test_state(test_name)
+    reference, registers = get_test_state(test_name)
+    state.board_effects = get_board_effects(state.grid)
+    state.debug = True
+    state.apply_all_effects(registers=registers)
+    reference.apply_all_effects(registers=registers)
+    assert state.robots_as_dict() == reference.robots_as_dict()
+    assert state.log_as_dict() == reference.log_as_dict()
+
+
+@pytest.mark.parametrize("map_name", ["maps/belt_map.json", "maps/killer_map.json",
+                                      "maps/chop_shop.json", "maps/wavy_map.json",
+                                      "maps/test_maps/test_6.json"])
+def test_compiled_effects_play_random_games(map_name):
+    """
+    Play games with random cards with and without the compiled board effects
+    and assert the game logs are the same.
+    """
+    state = State.get_start_state(map_name, seed=7)
+    reference = State.get_start_state(map_name, seed=7)
+    state.board_effects = get_board_effects(state.grid)
+    for game_round in range(15):
+        state.play_round()
+        reference.play_round()
+    assert state.log_as_dict() == reference.log_as_dict()
+    assert state.robots_as_dict() == reference.robots_as_dict()
+
+
+def test_compiled_effects_are_shared():
+    """
+    Assert the function is compiled once for maps with the same board.
+    """
+    grid = get_grid(get_board("maps/belt_map.json"))
+    other_grid = get_grid(board_from_data(get_map_data("maps/belt_map.json")))
+    assert other_grid is not grid
+    assert get_board_effects(other_grid) is get_board_effects(grid)
+    assert get_board_effects(get_grid(get_board("maps/killer_map.json"))) is not \
+        get_board_effects(grid)
+
+
+def test_missing_phases_are_left_out():
+    """
+    Assert phases without board elements aren't in the compiled source.
+    """
+    source = generate_source(get_grid(get_board("maps/test_maps/test_1.json")))
+    assert "ALL_BELTS.get" not in source
+    assert "active_pusher" not in source
+    assert "active_laser" not in source
+    source = generate_source(get_grid(get_board("maps/wavy_map.json")))
+    assert "ALL_BELTS.get" in source
+    assert "active_pusher" in source
+    assert "active_gear" not in source
+
+
+@pytest.mark.parametrize(
+    ("value", "source"),
+    [(Direction.E, "Direction.E"),
+     ((Rotation.LEFT,), "(Rotation.LEFT,)"),
+     ({(1, 2): (), (0, 5): None}, "{(0, 5): None, (1, 2): ()}"),
+     (set(), "frozenset()"),
+     ({(2, 1), (1, 2)}, "frozenset({(1, 2), (2, 1)})"),
+     ])
+def test_literal(value, source):
+    """
+    Assert values are written as Python source.
+    """
+    assert literal(value) == source
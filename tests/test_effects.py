@@ -146,6 +146,38 @@ def compare_results_with_robots(commands, state):
                     assert robot.start_coordinates == start_coordinates
 
 
+def get_robots(state):
+    """
+    Return list of dictionaries of robots' attributes
+    in the same form as LockstepGames.get_robots() (see test_lockstep.py).
+    """
+    return [{
+        "coordinates": robot.coordinates,
+        "direction": robot.direction,
+        "lives": robot.lives,
+        "flags": robot.flags,
+        "damages": robot.damages,
+        "permanent_damages": robot.permanent_damages,
+        "power_down": robot.power_down,
+        "winner": robot.winner,
+        "start_coordinates": robot.start_coordinates,
+    } for robot in state.robots]
+
+
+def get_test_state(test_name):
+    """
+    Return state of the test map with cards and attributes set by commands.
+    """
+    commands_file = Path("tests/") / test_name / "commands.yaml"
+    if not commands_file.exists():
+        commands_file = None
+    commands = read_commands(commands_file)
+    state = State.get_start_state(Path("tests/") / test_name / "map.json")
+    assign_cards_to_robots(commands, state)
+    assign_prerequisites_to_robots(commands, state)
+    return state, get_registers(commands)
+
+
 @pytest.mark.parametrize(
         ("test_name"),
         get_test_names(),
@@ -160,6 +192,8 @@ def test_play_game(test_name):
         commands_file = None
 
     state = State.get_start_state(map_file)
+    # Cross-check the index of robots' coordinates during the game.
+    state.debug = True
     stop_fields = get_start_tiles(state._board, "stop")
 
     commands = read_commands(commands_file)
@@ -0,0 +1,168 @@
+"""
+Tests of the compiled game board (grid.py).
+"""
+import pytest
+
+from grid import Grid, OFF_BOARD_TILES, check_tiles_passable
+from loading import get_board
+from tile import HoleTile
+from util_backend import Direction, Rotation, get_next_coordinates
+
+
+def test_grid_size():
+    """
+    Assert the grid has the same size as the board it was created from.
+    """
+    grid = Grid(get_board("maps/test_maps/test_1.json"))
+    assert (grid.width, grid.height) == (12, 12)
+
+
+@pytest.mark.parametrize("coordinates", [(0, 0), (5, 5), (11, 0), (3, 11)])
+def test_grid_tiles_match_board(coordinates):
+    """
+    Assert the grid returns the same tiles as the board dictionary.
+    """
+    board = get_board("maps/test_maps/test_1.json")
+    grid = Grid(board)
+    assert grid.get_tiles(coordinates) == board[coordinates]
+    assert grid.coordinates(grid.cell_id(coordinates)) == coordinates
+
+
+@pytest.mark.parametrize("coordinates", [(-1, 0), (0, -1), (12, 5), (5, 12)])
+def test_grid_off_board(coordinates):
+    """
+    Assert coordinates out of the board have no cell id
+    and the shared hole tile is returned for them.
+    """
+    grid = Grid(get_board("maps/test_maps/test_1.json"))
+    assert grid.cell_id(coordinates) is None
+    assert grid.get_tiles(coordinates) is OFF_BOARD_TILES
+    assert isinstance(grid.get_tiles(coordinates)[0], HoleTile)
+
+
+@pytest.mark.parametrize("map_name", ["maps/test_maps/test_3.json", "maps/belt_map.json"])
+def test_grid_walls_match_tiles(map_name):
+    """
+    Assert the compiled wall bitmasks give the same result as the checks
+    of walls on both tiles, for every cell and direction.
+    """
+    grid = Grid(get_board(map_name))
+    for cell in range(grid.width * grid.height):
+        coordinates = grid.coordinates(cell)
+        for direction in Direction:
+            next_coordinates = get_next_coordinates(coordinates, direction)
+            expected = check_tiles_passable(
+                grid.get_tiles(coordinates), grid.get_tiles(next_coordinates), direction)
+            assert grid.can_move(coordinates, direction) == expected
+            assert grid.neighbours[cell][direction.index] == grid.cell_id(next_coordinates)
+
+
+def test_grid_laser_beams():
+    """
+    Assert laser beams are traced from their start tiles over the following
+    laser tiles and carry the laser's strength.
+    """
+    grid = Grid(get_board("maps/test_maps/test_6.json"))
+    beams = {beam.start: beam for beam in grid.laser_beams}
+    assert set(beams) == {(0, 0), (1, 0), (2, 0)}
+    assert beams[(2, 0)].direction == Direction.N
+    assert beams[(2, 0)].strength == 3
+    assert beams[(2, 0)].cells == [(2, 0), (2, 1)]
+
+
+def test_grid_laser_beam_position():
+    """
+    Assert the beam and position are found for coordinates on the beam
+    and a robot between the start and the position blocks the beam.
+    """
+    grid = Grid(get_board("tests/test_lasers_1/map.json"))
+    beam, position = grid.get_laser_beam((1, 3), Direction.N)
+    assert beam.start == (1, 0)
+    assert position == 3
+    assert beam.is_blocked(position, {(1, 1): "robot"})
+    assert not beam.is_blocked(position, {(2, 1): "robot", (1, 3): "robot"})
+    assert grid.get_laser_beam((2, 2), Direction.N) == (None, None)
+
+
+@pytest.mark.parametrize(
+    ("coordinates", "direction", "distance"),
+    [((2, 3), Direction.E, 1),
+     ((2, 3), Direction.W, 0),
+     ((3, 3), Direction.N, 8),
+     ((0, 0), Direction.S, 0),
+     ])
+def test_grid_sight(coordinates, direction, distance):
+    """
+    Assert the distance to the nearest wall or board edge is computed.
+    """
+    grid = Grid(get_board("maps/test_maps/test_3.json"))
+    assert grid.get_sight(coordinates, direction) == distance
+
+
+def test_grid_belt_tables():
+    """
+    Assert belt successor tables contain next coordinates and rotations
+    on entry, and express belts are part of all belts.
+    """
+    grid = Grid(get_board("maps/test_maps/test_6.json"))
+    assert grid.all_belts[(4, 0)] == ((5, 0), ())
+    assert grid.express_belts[(5, 2)] == ((4, 2), (Rotation.LEFT,))
+    assert (4, 0) not in grid.express_belts
+    for coordinates, belt in grid.express_belts.items():
+        assert grid.all_belts[coordinates] == belt
+
+
+def test_grid_phase_cells():
+    """
+    Assert tiles of the register phases are indexed by their coordinates
+    and pushers are split by their register.
+    """
+    grid = Grid(get_board("maps/test_maps/test_6.json"))
+    assert (1, 3) in grid.pusher_cells[1]
+    assert (2, 3) in grid.pusher_cells[0]
+    assert grid.gear_cells >= {(3, 3), (3, 2)}
+    assert grid.laser_cells >= {(0, 0), (0, 1)}
+    assert grid.checkpoint_cells == {(0, 3), (1, 2), (2, 2)}
+    # Start tile doesn't take part in any phase.
+    assert (0, 2) not in grid.gear_cells | grid.laser_cells | grid.checkpoint_cells
+
+
+@pytest.mark.parametrize(
+    ("coordinates", "distance"),
+    [((0, 3), 0),
+     ((1, 3), 1),
+     ((0, 2), 1),
+     ((3, 1), 5),
+     ((0, 1), None),
+     ((-1, 3), None),
+     ])
+def test_grid_flag_distances(coordinates, distance):
+    """
+    Assert count of registers needed to get to the flag is computed,
+    walls, holes and belts are taken into account.
+    """
+    grid = Grid(get_board("maps/test_maps/test_6.json"))
+    assert grid.get_flag_distance(coordinates, 1) == distance
+
+
+def test_grid_flag_distances_unknown_flag():
+    """
+    Assert there is no distance to the flag which isn't on the board
+    and the distance fields are computed only once.
+    """
+    grid = Grid(get_board("maps/test_maps/test_6.json"))
+    assert grid.get_flag_distance((0, 3), 9) is None
+    assert grid.get_flag_distances() is grid.get_flag_distances()
+
+
+def test_grid_neighbours():
+    """
+    Assert the neighbour table contains cell ids of the neighbouring tiles
+    and None out of the board.
+    """
+    grid = Grid(get_board("maps/test_maps/test_6.json"))
+    cell = grid.cell_id((0, 3))
+    assert grid.neighbours[cell][Direction.E.index] == grid.cell_id((1, 3))
+    assert grid.neighbours[cell][Direction.S.index] == grid.cell_id((0, 2))
+    assert grid.neighbours[cell][Direction.N.index] is None
+    assert grid.neighbours[cell][Direction.W.index] is None
@@ -8,7 +8,7 @@ import pytest
 from pathlib import Path
 
 from loading import get_map_data, get_tiles_data, get_tile_id, get_tile_direction
-from loading import get_board, get_tiles_properties
+from loading import get_board, board_from_data, get_tiles_properties
 from util_backend import Direction, Rotation
 from tile import Tile, HoleTile
 from validator import check_tiles, WrongLayersOrderError, RepeatingTilesError
@@ -280,3 +280,64 @@ def test_convert_tile_direction(test_case):
     """
     tile_number = test_case
     assert get_tile_direction(tile_number) == CONVERT_TEST_DATA[test_case]["direction"]
+
+
+def test_same_tiles_are_shared():
+    """
+    Assert the same tiles are one object, also between loaded boards.
+    """
+    board = get_board("maps/test_maps/test_1.json")
+    other_board = get_board("maps/test_maps/test_1.json")
+    assert board[(11, 5)][0] is board[(5, 11)][0]
+    assert board[(11, 5)][0] is other_board[(11, 5)][0]
+
+
+def test_tiles_cannot_be_changed():
+    """
+    Assert shared tiles can't be changed or get new attributes.
+    """
+    tile = get_board("maps/test_maps/test_6.json")[(0, 0)][1]
+    with pytest.raises(AttributeError):
+        tile.laser_strength = 5
+    with pytest.raises(AttributeError):
+        tile.color = "red"
+
+
+def test_board_cannot_be_changed():
+    """
+    Assert the shared board and its tiles on coordinates can't be changed.
+    """
+    board = get_board("maps/test_maps/test_6.json")
+    with pytest.raises(TypeError):
+        board[(0, 0)] = ()
+    with pytest.raises(TypeError):
+        del board[(0, 0)]
+    with pytest.raises(TypeError):
+        board.update({})
+    with pytest.raises(AttributeError):
+        board[(0, 0)].append(None)
+    assert get_board("maps/test_maps/test_6.json") == board_from_data(
+        get_map_data("maps/test_maps/test_6.json"))
+
+
+def test_map_info():
+    """
+    Assert information about the map is computed when the board is loaded.
+    """
+    info = get_board("maps/test_maps/test_6.json").info
+    assert (info.width, info.height) == (6, 4)
+    assert info.flags == {1: (0, 3)}
+    assert info.flag_count == 1
+    assert list(info.start_tiles) == [1]
+    assert info.start_tiles[1]["coordinates"] == (0, 2)
+    assert info.tile_counts["belt"] == 8
+    assert info.tile_counts["hole"] == 1
+
+
+
+def test_board_is_loaded_once():
+    """
+    Assert the same map is loaded only once.
+    """
+    board = get_board("maps/test_maps/test_6.json")
+    assert get_board("maps/test_maps/test_6.json") is board
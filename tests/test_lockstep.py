@@ -0,0 +1,103 @@
+"""
+Tests of the lockstep engine (lockstep.py).
+
+The lockstep games are compared with State on the test maps (see test_effects.py)
+and on random games.
+"""
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from backend import State
+from lockstep import LockstepGames, LockstepBoard, DifferentMapError
+from tests.test_effects import get_test_names, get_robots, get_test_state
+
+
+def assert_same_robots(games, states):
+    """
+    Assert robots of lockstep games are the same as robots of the states.
+    """
+    for game, state in enumerate(states):
+        robots = games.get_robots(game)
+        for robot in robots:
+            del robot["index"]
+        assert robots == get_robots(state)
+
+
+@pytest.mark.parametrize("test_name", get_test_names())
+def test_lockstep_plays_test_maps(test_name):
+    """
+    Play the test maps with State and lockstep games (three copies of the game)
+    and assert the robots are the same.
+    """
+    state, registers = get_test_state(test_name)
+    games = LockstepGames([state] * 3)
+    state.apply_all_effects(registers=registers)
+    games.apply_all_effects(registers=registers)
+    assert_same_robots(games, [state] * 3)
+
+
+@pytest.mark.parametrize("map_name", ["maps/belt_map.json", "maps/killer_map.json",
+                                      "maps/repair_map.json"])
+def test_lockstep_plays_random_games(map_name):
+    """
+    Play games with random cards with State and lockstep games
+    and assert the robots are the same after every round.
+    """
+    states = [State.get_start_state(map_name, seed=seed) for seed in range(4)]
+    games = LockstepGames(states)
+    for game_round in range(15):
+        for state in states:
+            for robot in state.robots:
+                robot.select_cards(state)
+        games.set_programs(states)
+        for state in states:
+            state.apply_all_effects()
+            state.check_winner()
+        games.apply_all_effects()
+        games.check_winner()
+        assert_same_robots(games, states)
+        for state in states:
+            for robot in state.robots:
+                robot.clear_robot_attributes(state)
+                state.deal_cards(robot)
+
+
+def test_lockstep_random_programs():
+    """
+    Assert random programs fill unblocked registers with cards from the pack
+    and the games can be played.
+    """
+    games = LockstepGames.get_start_games("maps/belt_map.json", 10)
+    games.damages[0, 0] = 6
+    games.program_kinds[0, 0, 4] = 0
+    games.deal_random_programs(numpy.random.default_rng(0))
+    assert (games.program_kinds[1:] > 0).all()
+    # Robot with 6 damages has only 3 unblocked cards.
+    assert games.program_kinds[0, 0, 4] == 0
+    games.play_round(numpy.random.default_rng(0))
+    assert games.game_round == 2
+
+
+def test_lockstep_board_frame():
+    """
+    Assert the cells around the board are holes and cell ids
+    are converted back to coordinates.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    board = LockstepBoard(state.grid)
+    assert board.holes[board.cell_id((-1, 0))]
+    assert board.holes[board.cell_id((12, 11))]
+    assert not board.holes[board.cell_id((0, 0))]
+    assert not board.holes[board.nowhere]
+    assert board.coordinates[board.cell_id((3, 5))] == (3, 5)
+
+
+def test_lockstep_needs_one_map():
+    """
+    Assert lockstep games can't be created from states with different maps.
+    """
+    states = [State.get_start_state("maps/belt_map.json"),
+              State.get_start_state("maps/spiral_map.json")]
+    with pytest.raises(DifferentMapError):
+        LockstepGames(states)
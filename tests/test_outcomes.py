@@ -0,0 +1,116 @@
+"""
+Tests of the cache of round outcomes (outcomes.py).
+"""
+import pytest
+
+from backend import State
+from outcomes import OutcomeCache
+from tests.test_backend import get_cards_and_robots
+
+
+def get_robots_and_log(state):
+    """
+    Return robots, game log and state hash of the state for comparing.
+    """
+    return (state.robots_as_dict(), state.log_as_dict(), state.state_hash,
+            {coordinates: robot.name for coordinates, robot in state.occupancy.items()},
+            state.logged_version == state.version)
+
+
+@pytest.mark.parametrize("map_name", ["maps/belt_map.json", "maps/killer_map.json",
+                                      "maps/test_maps/test_6.json"])
+def test_cached_rounds_are_the_same(map_name):
+    """
+    Play every round, roll it back and play it again from the cache,
+    assert the robots and the game log are the same as without the cache.
+    """
+    state = State.get_start_state(map_name, seed=4)
+    reference = State.get_start_state(map_name, seed=4)
+    state.outcomes = OutcomeCache()
+    for game_round in range(15):
+        for robot in state.robots:
+            robot.select_cards(state)
+        for robot in reference.robots:
+            robot.select_cards(reference)
+        checkpoint = state.checkpoint()
+        state.apply_all_effects()
+        state.rollback(checkpoint)
+        state.apply_all_effects()
+        reference.apply_all_effects()
+        assert get_robots_and_log(state) == get_robots_and_log(reference)
+        for current in state, reference:
+            current.check_winner()
+            current.game_round += 1
+            for robot in current.robots:
+                robot.clear_robot_attributes(current)
+                current.deal_cards(robot)
+    assert state.outcomes.hits == 15
+    state.check_occupancy()
+    state.check_state_hash()
+
+
+@pytest.mark.parametrize(("map_name", "seed"), [("maps/test_maps/test_1.json", 0),
+                                                 ("maps/test_maps/test_6.json", 1),
+                                                 ("maps/test_maps/test_start_direction.json", 0),
+                                                 ("maps/belt_map.json", 4)])
+def test_cached_games_are_the_same(map_name, seed):
+    """
+    Play the same game twice with one cache and once without it,
+    assert the game logs are the same entry by entry after every round.
+    """
+    cache = OutcomeCache()
+    states = [State.get_start_state(map_name, seed=seed) for i in range(3)]
+    first, second, reference = states
+    first.outcomes = second.outcomes = cache
+    for game_round in range(10):
+        for state in states:
+            state.play_round()
+        for state in first, second:
+            assert len(state.log) == len(reference.log)
+            for entry, reference_entry in zip(state.log, reference.log):
+                assert entry == reference_entry
+            assert get_robots_and_log(state) == get_robots_and_log(reference)
+    assert cache.hits >= 10
+
+
+def test_cache_restores_removed_robots():
+    """
+    Assert the robots removed in the round are removed also
+    when the round is taken from the cache, and rollback brings them back.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    state.outcomes = OutcomeCache()
+    robots = state.robots
+    robots[0].permanent_damages = 10
+    before = get_cards_and_robots(state)
+    checkpoint = state.checkpoint()
+    state.apply_all_effects(registers=0)
+    after = get_cards_and_robots(state)
+    state.rollback(checkpoint)
+    assert get_cards_and_robots(state) == before
+    state.apply_all_effects(registers=0)
+    assert robots[0] not in state.robots
+    assert get_cards_and_robots(state)[:1] == after[:1]
+    state.rollback(checkpoint)
+    assert state.robots is robots
+
+
+def test_cache_statistics():
+    """
+    Assert hits, misses and evictions are counted
+    and the least recently used outcome is thrown away.
+    """
+    cache = OutcomeCache(maxsize=1)
+    first = State.get_start_state("maps/test_maps/test_3.json")
+    second = State.get_start_state("maps/test_maps/test_3.json")
+    second.robots[0].damages = 1
+    for state in first, first, second, first:
+        state.outcomes = cache
+        checkpoint = state.checkpoint()
+        state.apply_all_effects(registers=0)
+        state.rollback(checkpoint)
+    assert cache.stats() == {"size": 1, "maxsize": 1, "hits": 1, "misses": 3,
+                             "evictions": 2, "hit_rate": 0.25}
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["hit_rate"] == 0
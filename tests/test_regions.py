@@ -0,0 +1,131 @@
+"""
+Tests of the register played by clusters of robots (regions.py).
+"""
+import random
+
+import pytest
+
+from backend import State, Robot, MovementCard, RotationCard, get_robot_names
+from loading import Board, get_board, get_map_info
+from regions import RegionResolver, get_clusters
+from util_backend import Direction, Rotation
+
+
+def get_large_board(map_name, copies):
+    """
+    Return board made of copies x copies copies of the map.
+    """
+    small_board = get_board(map_name)
+    width, height = small_board.info.width, small_board.info.height
+    tiles = {}
+    for i in range(copies):
+        for j in range(copies):
+            for (x, y), cell_tiles in small_board.items():
+                tiles[x + i * width, y + j * height] = cell_tiles
+    return Board(tiles, get_map_info(tiles, width * copies, height * copies))
+
+
+def get_state(board, robots_data, seed=0):
+    """
+    Return state of the board with robots given as list
+    of (direction, coordinates, card).
+    """
+    robots = [Robot(direction, coordinates, name) for (direction, coordinates, card), name
+              in zip(robots_data, get_robot_names())]
+    state = State(board, robots, seed)
+    state.start_coordinates = [coordinates for direction, coordinates, card in robots_data]
+    for robot, (direction, coordinates, card) in zip(robots, robots_data):
+        robot.program = [card] * 5
+    return state
+
+
+def test_far_robots_are_in_different_clusters():
+    """
+    Assert robots which can't reach each other are in different clusters
+    ordered by the priority of their cards, robots near each other are together.
+    """
+    board = get_large_board("maps/test_maps/test_1.json", 4)
+    state = get_state(board, [
+        (Direction.N, (2, 2), MovementCard(100, 1)),
+        (Direction.N, (30, 2), MovementCard(300, 2)),
+        (Direction.N, (4, 2), RotationCard(200, Rotation.LEFT)),
+    ])
+    clusters = get_clusters(state.grid, state.robots, 0)
+    robots = state.robots
+    assert clusters == [[robots[1]], [robots[0], robots[2]]]
+
+
+def test_robots_in_laser_line_are_together():
+    """
+    Assert robot shooting at a far robot is in his cluster.
+    """
+    board = get_large_board("maps/test_maps/test_1.json", 4)
+    state = get_state(board, [
+        (Direction.E, (2, 2), MovementCard(100, 1)),
+        (Direction.N, (30, 2), MovementCard(300, 2)),
+    ])
+    assert len(get_clusters(state.grid, state.robots, 0)) == 1
+
+
+def test_cluster_logs_are_merged_by_priority():
+    """
+    Assert the log entries of the cluster with the higher card priority
+    come first and show the robots of the other cluster where they are.
+    """
+    board = get_large_board("maps/test_maps/test_1.json", 4)
+    state = get_state(board, [
+        (Direction.N, (2, 2), MovementCard(100, 1)),
+        (Direction.N, (30, 2), MovementCard(300, 2)),
+    ])
+    state.regions = RegionResolver(min_robots=2)
+    state.play_registers(1)
+    assert state.regions.split_registers == 1
+    assert [[snapshot[1] for snapshot in entry] for entry in state.log] == [
+        [(2, 2), (30, 2)],
+        [(2, 2), (30, 3)],
+        [(2, 2), (30, 4)],
+        [(2, 3), (30, 4)],
+    ]
+
+
+def test_few_robots_are_played_at_once():
+    """
+    Assert the resolver leaves the register to the state when there are few robots.
+    """
+    state = State.get_start_state("maps/belt_map.json", players=3)
+    for robot in state.robots:
+        robot.select_cards(state)
+    assert not RegionResolver().apply_register(state, 0)
+    assert state.log == []
+
+
+@pytest.mark.parametrize("map_name", ["maps/test_maps/test_1.json", "maps/killer_map.json",
+                                      "maps/belt_map.json"])
+def test_regions_play_like_state(map_name):
+    """
+    Play games on a large board with and without the resolver
+    and assert the robots are the same after every round
+    and the game log shows all robots.
+    """
+    board = get_large_board(map_name, 4)
+    rng = random.Random(0)
+    cells = [coordinates for coordinates in board
+             if not State(board, []).grid.is_deadly(coordinates)]
+    resolver = RegionResolver(min_robots=2)
+    for game in range(5):
+        robots_data = [(rng.choice(list(Direction)), coordinates, None)
+                       for coordinates in rng.sample(cells, 8)]
+        state = get_state(board, robots_data, seed=game)
+        reference = get_state(board, robots_data, seed=game)
+        state.regions = resolver
+        for current in state, reference:
+            for robot in current.robots:
+                current.deal_cards(robot)
+        for game_round in range(5):
+            state.play_round()
+            reference.play_round()
+            assert state.robots_as_dict() == reference.robots_as_dict()
+            state.check_occupancy()
+            state.check_state_hash()
+        assert all(len(entry) == len(state.robots) for entry in state.log[-10:])
+    assert resolver.split_registers > 0
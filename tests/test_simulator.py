@@ -0,0 +1,70 @@
+"""
+Tests of the game simulator (simulator.py).
+"""
+import pytest
+
+from backend import State, MovementCard, RotationCard
+from simulator import play_game, simulate_games, summarize, format_summary
+from simulator import flag_policy, forward_policy, guess_card_effect
+from util_backend import Direction, Rotation
+
+
+def test_same_seed_gives_the_same_game():
+    """
+    Assert games with the same seed end the same way.
+    """
+    results = [play_game("maps/belt_map.json", 5, ("flag", "random"), max_rounds=10)
+               for i in range(2)]
+    assert results[0].rounds == results[1].rounds
+    assert results[0].winners == results[1].winners
+    assert results[0].deaths == results[1].deaths
+
+
+def test_game_ends_with_max_rounds():
+    """
+    Assert the game is stopped after max rounds and phases are measured.
+    """
+    result = play_game("maps/belt_map.json", 0, max_rounds=2)
+    assert result.rounds <= 2
+    assert {"cards", "tiles", "belts", "policies", "total"} <= set(result.timings)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_simulate_games(workers):
+    """
+    Assert games played in one or more processes give the same results.
+    """
+    results = simulate_games("maps/belt_map.json", games=3, policies=["flag"],
+                             max_rounds=5, workers=workers)
+    assert [result.seed for result in results] == [0, 1, 2]
+    expected = [play_game("maps/belt_map.json", seed, ["flag"], max_rounds=5)
+                for seed in range(3)]
+    assert [result.rounds for result in results] == [result.rounds for result in expected]
+    summary = summarize(results)
+    assert summary["games"] == 3
+    assert "Games: 3" in format_summary(summary)
+
+
+@pytest.mark.parametrize(("card", "coordinates", "direction"),
+                         [(MovementCard(100, 2), (3, 5), Direction.N),
+                          (MovementCard(100, -1), (3, 2), Direction.N),
+                          (RotationCard(100, Rotation.LEFT), (3, 3), Direction.W),
+                          ])
+def test_guess_card_effect(card, coordinates, direction):
+    """
+    Assert the card effect is guessed on the empty board.
+    """
+    assert guess_card_effect(card, (3, 3), Direction.N) == (coordinates, direction)
+
+
+@pytest.mark.parametrize("policy", [flag_policy, forward_policy])
+def test_policy_chooses_dealt_cards(policy):
+    """
+    Assert policy chooses different dealt cards for unblocked registers.
+    """
+    state = State.get_start_state("maps/belt_map.json", seed=0)
+    robot = state.robots[0]
+    card_indexes = policy(robot, state)
+    assert len(card_indexes) == robot.unblocked_cards
+    assert len(set(card_indexes)) == len(card_indexes)
+    assert all(0 <= index < len(robot.dealt_cards) for index in card_indexes)
@@ -0,0 +1,71 @@
+"""
+Tests of the table of single-robot transitions (transitions.py).
+"""
+import pytest
+
+from backend import State, MovementCard, RotationCard
+from loading import get_board
+from transitions import TransitionTable, get_transition_table
+from util_backend import Direction, Rotation
+from tests.test_effects import get_robots
+
+
+@pytest.mark.parametrize(
+    ("coordinates", "direction", "card", "result"),
+    [((4, 0), Direction.N, None, ((5, 0), Direction.N, 0, False)),
+     ((5, 2), Direction.N, None, ((4, 1), Direction.W, 0, False)),
+     ((0, 0), Direction.N, None, ((0, 0), Direction.N, 1, False)),
+     ((0, 3), Direction.S, MovementCard(100, 1), ((0, 2), Direction.S, 0, False)),
+     ((3, 1), Direction.S, MovementCard(100, 1), (None, Direction.S, 0, True)),
+     ((1, 2), Direction.N, RotationCard(10, Rotation.LEFT), ((1, 2), Direction.W, 0, False)),
+     ])
+def test_transition(coordinates, direction, card, result):
+    """
+    Assert the transition contains robot's coordinates, direction,
+    damages and death after the card and the board elements.
+    """
+    table = TransitionTable(get_board("maps/test_maps/test_6.json"))
+    transition = table.get_transition(coordinates, direction, card, 0)
+    assert (transition.coordinates, transition.direction,
+            transition.damages, transition.dead) == result
+    assert transition.path[0] == coordinates
+
+
+def test_transitions_are_memoized():
+    """
+    Assert the transition is computed once for cards with the same effect.
+    """
+    table = get_transition_table("maps/test_maps/test_6.json")
+    assert get_transition_table("maps/test_maps/test_6.json") is table
+    transition = table.get_transition((4, 0), Direction.E, MovementCard(100, 2), 1)
+    assert table.get_transition((4, 0), Direction.E, MovementCard(200, 2), 1) is transition
+
+
+def test_crossing_robots_are_played_step_by_step():
+    """
+    Assert the register isn't played from the table when robots' paths cross.
+    """
+    state = State.get_start_state("maps/test_maps/test_3.json")
+    first, second = state.robots[:2]
+    first.coordinates, first.direction = (5, 0), Direction.E
+    second.coordinates, second.direction = (6, 0), Direction.W
+    for robot in state.robots:
+        robot.program = [MovementCard(100, 1)] * 5
+    table = get_transition_table("maps/test_maps/test_3.json")
+    assert not table.apply_register(state, 0)
+    assert first.coordinates == (5, 0)
+
+
+@pytest.mark.parametrize("map_name", ["maps/belt_map.json", "maps/killer_map.json",
+                                      "maps/chop_shop.json"])
+def test_transitions_play_the_same_game(map_name):
+    """
+    Assert the state with the transition table plays the same game
+    as the state without it.
+    """
+    states = [State.get_start_state(map_name, players=3, seed=seed) for seed in (4, 4)]
+    states[1].transitions = get_transition_table(map_name)
+    for game_round in range(15):
+        for state in states:
+            state.play_round()
+        assert get_robots(states[0]) == get_robots(states[1])
@@ -0,0 +1,39 @@
+"""
+Tests of directions and rotations (util_backend.py).
+"""
+import pytest
+
+from util_backend import Direction, Rotation, DELTAS, DIRECTIONS, TURNS, get_next_coordinates
+
+
+@pytest.mark.parametrize(
+    ("direction", "rotation", "new_direction"),
+    [(Direction.N, Rotation.LEFT, Direction.W),
+     (Direction.N, Rotation.RIGHT, Direction.E),
+     (Direction.W, Rotation.RIGHT, Direction.N),
+     (Direction.S, Rotation.U_TURN, Direction.N),
+     (Direction.E, Rotation.U_TURN, Direction.W),
+     ])
+def test_get_new_direction(direction, rotation, new_direction):
+    """
+    Assert the direction is rotated by the lookup table the same way
+    as by adding degrees.
+    """
+    assert direction.get_new_direction(rotation) == new_direction
+    assert direction + rotation == new_direction
+    assert new_direction.value == (direction.value + rotation.value) % 360
+
+
+def test_direction_tables():
+    """
+    Assert directions are ordered by their index and every direction
+    has its opposite.
+    """
+    assert [direction.index for direction in DIRECTIONS] == [0, 1, 2, 3]
+    assert Direction.E + Direction.S == Direction.W
+    for direction in Direction:
+        assert direction.opposite.opposite == direction
+        assert get_next_coordinates(get_next_coordinates((3, 3), direction),
+                                    direction.opposite) == (3, 3)
+        assert TURNS[direction.index][0] == direction
+        assert DELTAS[direction.index] == direction.coor_delta
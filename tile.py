@@ -2,15 +2,27 @@
 Tile contains class Tile and its subclasses.
 """
 
-from util_backend import Direction, Rotation, get_next_coordinates
+from util_backend import Direction, Rotation
 
 
 class Tile:
+    # Tiles are shared by all cells and games with the same tile
+    # (see create_tile_subclass), so they are small and can't be changed.
+    __slots__ = ("direction", "name", "type")
+
     def __init__(self, direction, name, tile_type, properties):
         self.direction = direction
         self.name = name
         self.type = tile_type
 
+    def __setattr__(self, name, value):
+        """
+        Allow to set every attribute only once, when the tile is created.
+        """
+        if hasattr(self, name):
+            raise AttributeError("Tile attribute '{}' can't be changed.".format(name))
+        super().__setattr__(name, value)
+
     def __eq__(self, other):
         """
         Override standard method for comparing the tiles.
@@ -64,12 +76,23 @@ class Tile:
         """
         return False
 
+    def get_belt_rotation(self, direction):
+        """
+        Return rotation of robot entering the tile on conveyor belts
+        or None if the robot isn't rotated.
+        direction: direction from which robot entered a tile
+        """
+        return None
+
     def rotate_robot_on_belt(self, robot, direction, state):
         """
         Rotate robot on rotating conveyor belts. If robot's rotated,
         will be decided by the direction he entered a tile.
         direction: direction from which robot entered a tile
         """
+        rotation = self.get_belt_rotation(direction)
+        if rotation is not None:
+            robot.rotate(rotation, state)
         return robot
 
     def push_robot(self, robot, state, register):
@@ -112,6 +135,8 @@ class Tile:
 
 
 class WallTile(Tile):
+    __slots__ = ()
+
     def can_move_from(self, direction):
         # The direction of the wall is the same as the direction in which
         # robot wants to move from the tile.
@@ -121,22 +146,28 @@ class WallTile(Tile):
         # If there is a wall in direction of the robot movement,
         # then the direction of the robot goes against the direction of the wall.
         # Because of that the tile is checked in upside down direction.
-        return not (self.direction.get_new_direction(Rotation.U_TURN) == direction)
+        return not (self.direction.opposite == direction)
 
 
 class StartTile(Tile):
+    __slots__ = ("number",)
+
     def __init__(self, direction, name, tile_type, properties):
         self.number = properties["number"]
         super().__init__(direction, name, tile_type, properties)
 
 
 class StopTile(Tile):
+    __slots__ = ("number",)
+
     def __init__(self, direction, name, tile_type, properties):
         self.number = properties["number"]
         super().__init__(direction, name, tile_type, properties)
 
 
 class HoleTile(Tile):
+    __slots__ = ()
+
     def __init__(self, direction=Direction.N, name=None, tile_type=None, properties={}):
         super().__init__(direction, name, tile_type, properties)
 
@@ -147,6 +178,8 @@ class HoleTile(Tile):
 
 
 class BeltTile(Tile):
+    __slots__ = ("direction_out", "express")
+
     def __init__(self, direction, name, tile_type, properties):
         if properties["direction_out"] == 0:
             self.direction_out = Direction.N
@@ -165,22 +198,31 @@ class BeltTile(Tile):
         else:
             return False
 
-    def rotate_robot_on_belt(self, robot, direction, state):
+    def get_belt_rotation(self, direction):
         # Special condition for one type of crossroads:
         # If crossroads have Direction.N, then the special type has exit
         # on south part of tile.
         if self.direction_out == Rotation.U_TURN:
             if self.direction.get_new_direction(Rotation.RIGHT) == direction:
-                robot.rotate(Rotation.RIGHT, state)
+                return Rotation.RIGHT
             else:
-                robot.rotate(Rotation.LEFT, state)
+                return Rotation.LEFT
         # All other rotating belts or crossroads.
         elif isinstance(self.direction_out, Rotation):
-                if direction == self.direction:
-                    robot.rotate(self.direction_out, state)
+            if direction == self.direction:
+                return self.direction_out
+        return None
+
+    def get_belt_direction(self):
+        """
+        Return direction in which the belt moves robots.
+        """
+        return self.direction.get_new_direction(self.direction_out)
 
 
 class PusherTile(Tile):
+    __slots__ = ("register",)
+
     def __init__(self, direction, name, tile_type, properties):
         self.register = properties["register"]
         super().__init__(direction, name, tile_type, properties)
@@ -191,11 +233,13 @@ class PusherTile(Tile):
         #  0 for even register number,
         #  1 for odd register number.
         if (register + 1) % 2 == self.register:
-            robot.move(self.direction.get_new_direction(Rotation.U_TURN), 1, state)
+            robot.move(self.direction.opposite, 1, state)
             return True
 
 
 class GearTile(Tile):
+    __slots__ = ("move_direction",)
+
     def __init__(self, direction, name, tile_type, properties):
         self.move_direction = Rotation(properties["move_direction"])
         super().__init__(direction, name, tile_type, properties)
@@ -207,6 +251,8 @@ class GearTile(Tile):
 
 
 class LaserTile(Tile):
+    __slots__ = ("laser_strength", "start")
+
     def __init__(self, direction, name, tile_type, properties):
         self.laser_strength = properties["laser_strength"]
         self.start = properties["start"]
@@ -214,41 +260,21 @@ class LaserTile(Tile):
 
     def shoot_robot(self, robot, state):
         # Robot stands on laser tile.
-        # If robot isn't standing on the start of the laser, look for other robots.
+        # If robot isn't standing on the start of the laser, look for other robots
+        # standing on the beam between him and the laser start.
         if not self.start:
-            # Get coordinates of current robot.
-            (x, y) = robot.coordinates
-            # Get coordinates of other robots.
-            coordinates = []
-            for robot_state in state.robots:
-                coordinates.append(robot_state.coordinates)
-            # Get direction in which it will be checked for other robots or laser start.
-            direction_to_start = self.direction.get_new_direction(Rotation.U_TURN)
-            # Check if there is another robot in direction of incoming laser.
-            while True:
-                # Get new coordinates.
-                (x, y) = get_next_coordinates((x, y), direction_to_start)
-                # Check for other robots.
-                if (x, y) in coordinates:
-                    # There is another robot.
-                    # Current robot won't be hit by laser.
-                    return
-                # Get new tiles.
-                new_tiles = state.get_tiles((x, y))
-                for tile in new_tiles:
-                    # Check if new tiles contain follow-up LaserTile in correct direction.
-                    if isinstance(tile, LaserTile) and tile.direction == self.direction:
-                        # Follow-up laser tile found, don't check ohter tiles here.
-                        break
-                # Check for laser start tile.
-                if tile.start:
-                    # Don't check new tiles.
-                    break
+            beam, position = state.grid.get_laser_beam(robot.coordinates, self.direction)
+            if beam is not None and beam.is_blocked(position, state.occupancy):
+                # There is another robot.
+                # Current robot won't be hit by laser.
+                return
         robot.be_damaged(state, self.laser_strength)
         return True
 
 
 class FlagTile(Tile):
+    __slots__ = ("number",)
+
     def __init__(self, direction, name, tile_type, properties):
         self.number = properties["number"]
         super().__init__(direction, name, tile_type, properties)
@@ -256,7 +282,7 @@ class FlagTile(Tile):
     def collect_flag(self, robot):
         # Robot always changes his start coordinates, when he is on a flag.
         # Flag number doesn't play a role.
-        robot.start_coordinates.append(robot.coordinates)
+        robot.add_start_coordinates(robot.coordinates)
         # Collect only correct flag.
         # Correct flag will have a number that is equal to robot's flag number plus one.
         if (robot.flags + 1) == self.number:
@@ -265,6 +291,8 @@ class FlagTile(Tile):
 
 
 class RepairTile(Tile):
+    __slots__ = ("new_start",)
+
     def __init__(self, direction, name, tile_type, properties):
         self.new_start = properties["new_start"]
         super().__init__(direction, name, tile_type, properties)
@@ -279,7 +307,7 @@ class RepairTile(Tile):
     def set_new_start(self, robot):
         # Change start coordinates of robot, if it's a tile property.
         if self.new_start:
-            robot.start_coordinates.append(robot.coordinates)
+            robot.add_start_coordinates(robot.coordinates)
             return True
 
 
@@ -289,8 +317,21 @@ TILE_CLS = {'wall': WallTile, 'start': StartTile, 'hole': HoleTile,
             'ground': Tile, 'stop': StopTile}
 
 
+# Dictionary of all created tiles, see create_tile_subclass.
+_tiles = {}
+
+
 def create_tile_subclass(direction, name, tile_type, properties):
     """
     Create tile subclass according to its tile_type.
+
+    Tiles with the same type, direction, name and properties are created
+    only once and the same object is returned every time they're requested.
     """
-    return TILE_CLS[tile_type](direction, name, tile_type, properties)
+    key = tile_type, direction, name, tuple(sorted(properties.items()))
+    try:
+        return _tiles[key]
+    except KeyError:
+        tile = TILE_CLS[tile_type](direction, name, tile_type, properties)
+        _tiles[key] = tile
+        return tile
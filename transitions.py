@@ -0,0 +1,188 @@
+"""
+Transitions contain the table of single-robot card transitions.
+
+When a robot can't meet another robot during a register, the effect
+of his card and of the board elements which follow (belts, pushers, gears
+and lasers) depends only on his coordinates, direction, card and register.
+The table remembers these effects, so the same move isn't computed again.
+
+The table is opt-in, set it to the state which plays many rounds
+without the need of the step by step game log (bot search, previews):
+
+    state.transitions = get_transition_table(map_name)
+
+The registers played from the table have only one entry in the game log
+for the cards and board elements together, the robots end the same.
+"""
+from backend import State, Robot, get_robot_names
+from loading import get_board
+from tile import LaserTile
+from util_backend import Direction
+
+
+class Transition:
+    """
+    Effect of one card and the board elements on a robot standing alone.
+
+    coordinates: robot's coordinates at the end, None if he has died
+    direction: robot's direction at the end
+    damages: count of damages given by board lasers
+    dead: True if the robot has died
+    path: tuple of all coordinates the robot has stood on, from the start
+    """
+    __slots__ = ("coordinates", "direction", "damages", "dead", "path")
+
+    def __init__(self, coordinates, direction, damages, dead, path):
+        self.coordinates = coordinates
+        self.direction = direction
+        self.damages = damages
+        self.dead = dead
+        self.path = path
+
+    def __repr__(self):
+        return "<Transition {} {} damages: {} dead: {}>".format(
+            self.coordinates, self.direction, self.damages, self.dead)
+
+
+class ScratchState(State):
+    """
+    State with one robot used for computing transitions.
+
+    It has no game log and remembers all coordinates the robot stands on.
+    """
+    def __init__(self, board):
+        robot = Robot(Direction.N, None, get_robot_names()[0])
+        super().__init__(board, [robot])
+        self.path = []
+
+    def robot_changed(self, robot, name, old_value, new_value):
+        super().robot_changed(robot, name, old_value, new_value)
+        if name == "coordinates" and new_value is not None:
+            self.path.append(new_value)
+
+    def record_log(self):
+        pass
+
+
+class TransitionTable:
+    """
+    Memoized transitions of a robot for one map.
+
+    Transitions are computed when they are needed first, the key is
+    (coordinates, direction, card name, register).
+    """
+    def __init__(self, board):
+        self.scratch_state = ScratchState(board)
+        self.grid = self.scratch_state.grid
+        # Dictionary {(coordinates, direction, card name, register): Transition}
+        self.transitions = {}
+
+    def __repr__(self):
+        return "<TransitionTable {} transitions>".format(len(self.transitions))
+
+    def get_transition(self, coordinates, direction, card, register):
+        """
+        Return Transition of the robot which plays the card in the register.
+        Card None means the robot has no card (power down).
+        """
+        key = coordinates, direction, None if card is None else card.name, register
+        transition = self.transitions.get(key)
+        if transition is None:
+            transition = self.compute_transition(coordinates, direction, card, register)
+            self.transitions[key] = transition
+        return transition
+
+    def compute_transition(self, coordinates, direction, card, register):
+        """
+        Play the card and the board elements with the robot
+        of the scratch state and return Transition.
+        """
+        state = self.scratch_state
+        robot = state.robots[0]
+        robot.lives = 3
+        robot.damages = 0
+        robot.permanent_damages = 0
+        robot.direction = direction
+        robot.coordinates = coordinates
+        state.path = [coordinates]
+        if card is not None:
+            card.apply_effect(robot, state)
+        if not robot.inactive:
+            state.apply_board_effects(register)
+        dead = robot.inactive
+        return Transition(robot.coordinates, robot.direction, 0 if dead else robot.damages,
+                          dead, tuple(state.path))
+
+    def apply_register(self, state, register):
+        """
+        Apply cards and board elements of the register on robots
+        of the state from the table.
+
+        It is possible only if the robots' paths don't cross
+        and no robot stops a board laser shooting at another robot.
+        Otherwise return False and leave the state unchanged,
+        the register has to be played step by step.
+        """
+        moves = []
+        visited = set()
+        for robot in state.get_active_robots():
+            if robot.power_down:
+                card = None
+            else:
+                card = robot.program[register]
+                if card is None:
+                    return False
+            transition = self.get_transition(robot.coordinates, robot.direction, card, register)
+            if not visited.isdisjoint(transition.path):
+                return False
+            visited.update(transition.path)
+            moves.append((robot, transition))
+
+        if self.grid.laser_cells and self.is_laser_blocked(moves):
+            return False
+
+        for robot, transition in moves:
+            robot.direction = transition.direction
+            if transition.dead:
+                robot.die(state)
+            else:
+                robot.coordinates = transition.coordinates
+                if transition.damages:
+                    robot.be_damaged(state, transition.damages)
+        state.record_log()
+        return True
+
+    def is_laser_blocked(self, moves):
+        """
+        Check if a robot stands on a board laser beam
+        in front of another robot at the end of the moves.
+
+        moves: list of (robot, Transition)
+        """
+        # Dead robots are counted too (at the coordinates where they died),
+        # the robot killed by a laser stands on the board until he's shot.
+        occupancy = {transition.path[-1]: robot for robot, transition in moves}
+        for coordinates in occupancy:
+            if coordinates in self.grid.laser_cells:
+                for tile in self.grid.get_tiles(coordinates):
+                    if not isinstance(tile, LaserTile) or tile.start:
+                        continue
+                    beam, position = self.grid.get_laser_beam(coordinates, tile.direction)
+                    if beam is not None and beam.is_blocked(position, occupancy):
+                        return True
+        return False
+
+
+# Transition tables of maps, see get_transition_table().
+transition_tables = {}
+
+
+def get_transition_table(map_name):
+    """
+    Return transition table of the map, one table is created for every map.
+    """
+    table = transition_tables.get(map_name)
+    if table is None:
+        table = TransitionTable(get_board(map_name))
+        transition_tables[map_name] = table
+    return table
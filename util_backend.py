@@ -1,5 +1,9 @@
 """
 Util contains classes Direction and Rotation, accessed by both loading and backend.
+
+Directions and rotations are public Enums, the game logic computes with
+their integer indexes (quarter turns) and the lookup tables below,
+so no Enum value lookup is needed.
 """
 
 from enum import Enum
@@ -29,10 +33,13 @@ class Direction(Enum):
         obj = object.__new__(cls)
         obj._value_ = degrees
         obj.coor_delta = coor_delta
+        # Index of the direction (count of quarter turns from N),
+        # used in the lookup tables.
+        obj.index = degrees // 90
         return obj
 
     def __add__(self, other):
-        return Direction((self.value + other.value) % 360)
+        return TURNS[self.index][other.index]
 
     def get_new_direction(self, where_to):
         """
@@ -40,7 +47,14 @@ class Direction(Enum):
         Change attribute direction according to argument where_to,
         passed from class Rotation.
         """
-        return Direction(self + where_to)
+        return TURNS[self.index][where_to.index]
+
+    @property
+    def opposite(self):
+        """
+        Return the opposite direction.
+        """
+        return OPPOSITE_DIRECTIONS[self.index]
 
 
 class Rotation(Enum):
@@ -51,13 +65,29 @@ class Rotation(Enum):
     RIGHT = 90
     U_TURN = 180
 
+    def __init__(self, degrees):
+        # Count of quarter turns to the right, used in the lookup tables.
+        self.index = degrees // 90 % 4
+
+
+# Directions ordered by their index.
+DIRECTIONS = tuple(Direction)
+# TURNS[direction index][rotation index] is the direction after the rotation.
+TURNS = tuple(tuple(DIRECTIONS[(index + turn) % 4] for turn in range(4))
+              for index in range(4))
+OPPOSITE_DIRECTIONS = tuple(TURNS[index][2] for index in range(4))
+# Coordinates deltas of the neighbouring tiles, by direction index.
+DELTAS = tuple(direction.coor_delta for direction in DIRECTIONS)
+# Dictionary {coordinates delta: direction}
+DIRECTIONS_BY_DELTA = {direction.coor_delta: direction for direction in DIRECTIONS}
+
 
 def get_next_coordinates(coordinates, direction):
     """
     Get next coordinates in the given direction from current coordinates.
     """
     (x, y) = coordinates
-    (new_x, new_y) = direction.coor_delta
+    (new_x, new_y) = DELTAS[direction.index]
     x = x + new_x
     y = y + new_y
     return (x, y)